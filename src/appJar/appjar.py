@@ -49,7 +49,10 @@ import calendar  # datepicker
 import datetime  # datepicker & image
 import logging  # python's logger
 import inspect  # for logging
+import atexit  # for logging to a file
+import itertools  # event queue ordering
 from contextlib import contextmanager  # generators
+from bisect import bisect_left  # autocompletion
 try: import argparse   # argument parser
 except ImportError: argparse = None
 
@@ -72,7 +75,28 @@ parseString = TreeItem = TreeNode = None  # AjTree
 # GoogleMap
 base64 = urlencode = urlopen = urlretrieve = quote_plus = json = None
 ConfigParser = codecs = ParsingError = None  # used to parse language files
-Thread = Queue = None
+Thread = Queue = Lock = current_thread = None
+futures = None  # thread pools
+asyncio = None  # runAsync
+
+# logging - the level for trace messages, appJar's logger, and the levels accepted by logMessage
+TRACE = logging.DEBUG - 5
+appJarLogger = logging.getLogger("appJar")
+_LOG_LEVELS = {"EXCEPTION": logging.ERROR, "CRITICAL": logging.CRITICAL, "ERROR": logging.ERROR,
+               "WARNING": logging.WARNING, "INFO": logging.INFO, "DEBUG": logging.DEBUG, "TRACE": TRACE}
+_LOG_WRAPPERS = ("exception", "critical", "error", "warn", "debug", "trace", "info")
+
+# the background thread writing to the log file, set by setLogFile
+_logListener = None
+
+def _stopLogListener():
+    """ writes any waiting messages to the log file, and stops its thread """
+    global _logListener
+    if _logListener is not None:
+        _logListener.stop()
+        _logListener = None
+
+atexit.register(_stopLogListener)
 sqlite3 = None
 turtle = None
 webbrowser = None  # links
@@ -188,6 +212,7 @@ class gui(object):
 
     # static variables
     exe_file = None
+    logFileName = None
     exe_path = None
     lib_file = None
     lib_path = None
@@ -554,6 +579,8 @@ class gui(object):
         self.translations = {"POPUP":{}, "SOUND":{}, "EXTERNAL":{}}
         # first up, set up all the data stores
         self.widgetManager = WidgetManager()
+        # decoded images, kept within a memory budget (see setImageCacheSize)
+        self.imageCache = ImageCache()
         self.accessMade = False # accessibility subWindow
         self.splashConfig = None # splash screen?
         self.dnd = None # the dnd manager
@@ -736,9 +763,26 @@ class gui(object):
 
         # for configuting event processing
         self.EVENT_SIZE = 1000
-        self.EVENT_SPEED = 100
+        # how long (in ms) a worker thread waits for space in a full event queue, before its function is dropped
+        self.EVENT_TIMEOUT = 1000
+        # how often to check the event queue, if worker threads can't wake the GUI up (no file handlers, eg. on Windows)
+        self.EVENT_SPEED = 20
+        # how long (in ms) queued functions can run for, before the GUI gets to redraw & handle input
+        self.EVENT_BUDGET = 20
+
+        # named pools of worker threads (created when first used), how many threads each can have,
+        # and the latest function submitted for each "latest wins" key
+        self.threadPools = {}
+        self.threadPoolSizes = {"default": 4, "GoogleMap": 2, "images": 1}
+        self.latestThreads = {}
+        # the asyncio event loop used by runAsync, and the thread it runs on (started when first used)
+        self.asyncLoop = None
+        self.asyncThread = None
         self.preloadAnimatedImageId = None
         self.processQueueId = None
+        # the pipe worker threads use to wake the main thread (see _watchEventWake), and whether a wake is already on its way
+        self.eventWakeFds = None
+        self.eventWakePending = False
 
         # an array to hold any threaded events....
         self.events = []
@@ -1034,21 +1078,36 @@ class gui(object):
 
     def _loadThreading(self):
         """ loads threading classes, and sets up queue """
-        global Thread, Queue
+        global Thread, Queue, Lock, current_thread, futures
         if Thread is None:
             try:
-                from threading import Thread
+                from threading import Thread, Lock, current_thread
                 import Queue
             except ImportError: # python 3
                 try:
-                    from threading import Thread
+                    from threading import Thread, Lock, current_thread
                     import queue as Queue
                 except:
-                    Thread = Queue = False
+                    Thread = Queue = Lock = current_thread = False
                     return
 
-            self.eventQueue = Queue.Queue(maxsize=self.EVENT_SIZE)
-            self._processEventQueue()
+            # thread pools - python 3, or python 2 with the futures backport
+            try:
+                import concurrent.futures as futures
+            except ImportError:
+                futures = False
+            self.threadLock = Lock()
+
+            # items are (priority, number, time queued, func, args, kwargs)
+            # lowest priority first, then in the order they were queued
+            self.eventQueue = Queue.PriorityQueue(maxsize=self.EVENT_SIZE)
+            self.eventCounter = itertools.count()
+            self.eventStats = {"processed": 0, "drains": 0, "maxDepth": 0, "dropped": 0, "totalLatency": 0.0, "maxLatency": 0.0, "lastBatch": 0, "lastBatchTime": 0.0}
+            # worker threads update the stats too, when they drop a function
+            self.eventStatsLock = Lock()
+
+            # the queue is only ever drained by the main thread - tkinter isn't thread safe
+            self.processQueueId = self.after(0, self._startEventQueue)
 
     def _loadNanojpeg(self):
         """ loads jpeg support """
@@ -1658,11 +1717,30 @@ class gui(object):
 
     @staticmethod
     def setLogFile(fileName):
-        """ sets the filename for logging messages """
-        # Remove all handlers associated with the root logger object.
+        """ sets the filename for logging messages
+            where possible, messages are written by a background thread (through a QueueHandler)
+            so logging never waits for the disk """
+        global _logListener
+        # Remove (and close) all handlers associated with the root logger object.
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
-        logging.basicConfig(level=logging.INFO, filename=fileName, format='%(asctime)s %(name)s:%(levelname)s: %(message)s')
+            handler.close()
+        _stopLogListener()
+
+        fileHandler = logging.FileHandler(fileName)
+        fileHandler.setFormatter(logging.Formatter('%(asctime)s %(name)s:%(levelname)s: %(message)s'))
+        try:
+            from logging.handlers import QueueHandler, QueueListener
+            from queue import Queue as LogQueue
+        except ImportError:
+            # python 2 - write directly to the file
+            logging.root.addHandler(fileHandler)
+        else:
+            _logListener = QueueListener(LogQueue(-1), fileHandler)
+            _logListener.start()
+            logging.root.addHandler(QueueHandler(_logListener.queue))
+        logging.root.setLevel(logging.INFO)
+        gui.logFileName = fileName
         gui.info("Switched to logFile: %s", fileName)
 
     def _setLogFile(self, fileName):
@@ -1670,7 +1748,7 @@ class gui(object):
         gui.setLogFile(fileName)
 
     def getLogFile(self):
-        return logging.root.handlers[0].baseFilename
+        return gui.logFileName
 
     logFile = property(getLogFile, _setLogFile)
 
@@ -1678,12 +1756,12 @@ class gui(object):
     def setLogLevel(level):
         """ main function for setting the logging level
             provide one of: INFO, DEBUG, WARNING, ERROR, CRITICAL, EXCEPTION, None """
-        logging.getLogger("appJar").setLevel(getattr(logging, level.upper()))
+        appJarLogger.setLevel(getattr(logging, level.upper()))
         gui.info("Log level changed to: %s", level)
 
 
     def getLogLevel(self):
-        return logging.getLevelName(logging.getLogger("appJar").getEffectiveLevel())
+        return logging.getLevelName(appJarLogger.getEffectiveLevel())
 
     def _setLogLevel(self, level):
         ''' necessary so we can access this as a property '''
@@ -1691,83 +1769,84 @@ class gui(object):
 
     logLevel = property(getLogLevel, _setLogLevel)
 
+    # the wrappers below check the level first, so a message that won't be logged costs almost nothing
+
     @staticmethod
     def exception(message, *args):
         """ wrapper for logMessage - setting level to EXCEPTION """
-        gui.logMessage(message, "EXCEPTION", *args)
+        if appJarLogger.isEnabledFor(logging.ERROR): gui.logMessage(message, "EXCEPTION", *args)
 
     @staticmethod
     def critical(message, *args):
         """ wrapper for logMessage - setting level to CRITICAL """
-        gui.logMessage(message, "CRITICAL", *args)
+        if appJarLogger.isEnabledFor(logging.CRITICAL): gui.logMessage(message, "CRITICAL", *args)
 
     @staticmethod
     def error(message, *args):
         """ wrapper for logMessage - setting level to ERROR """
-        gui.logMessage(message, "ERROR", *args)
+        if appJarLogger.isEnabledFor(logging.ERROR): gui.logMessage(message, "ERROR", *args)
 
     @staticmethod
     def warn(message, *args):
         """ wrapper for logMessage - setting level to WARNING """
-        gui.logMessage(message, "WARNING", *args)
+        if appJarLogger.isEnabledFor(logging.WARNING): gui.logMessage(message, "WARNING", *args)
 
     @staticmethod
     def debug(message, *args):
         """ wrapper for logMessage - setting level to DEBUG """
-        gui.logMessage(message, "DEBUG", *args)
+        if appJarLogger.isEnabledFor(logging.DEBUG): gui.logMessage(message, "DEBUG", *args)
 
     @staticmethod
     def trace(message, *args):
         """ wrapper for logMessage - setting level to TRACE """
-        gui.logMessage(message, "TRACE", *args)
+        if appJarLogger.isEnabledFor(TRACE): gui.logMessage(message, "TRACE", *args)
 
     @staticmethod
     def info(message, *args):
         """ wrapper for logMessage - setting level to INFO """
-        gui.logMessage(message, "INFO", *args)
+        if appJarLogger.isEnabledFor(logging.INFO): gui.logMessage(message, "INFO", *args)
 
     @staticmethod
     def logMessage(msg, level, *args):
         """ allows user to log a message - provide a message and a log level
             any %s tags in the message will be replaced by the relevant positional *args """
-        frames = inspect.stack()
+        level = level.upper()
+        levelNo = _LOG_LEVELS.get(level)
+        if levelNo is None or not appJarLogger.isEnabledFor(levelNo): return
+
+        # only look at the calling frames once we know the message will be logged
+        # walking f_back is much cheaper than inspect.stack(), which reads the source of every frame
+        frame = inspect.currentframe()
+        caller = frame.f_back if frame is not None else None
         # try to ensure we only log extras if we're called from above functions
-        if frames[1][3] in ("exception", "critical", "error", "warn", "debug", "trace", "info"):
+        if caller is not None and caller.f_code.co_name in _LOG_WRAPPERS and caller.f_back is not None:
+            caller = caller.f_back
 
             callFrame = ""
-            try:
-                progName = gui.exe_file
-                for s in frames:
-                    if progName in s[1]:
-                        callFrame = s
+            progName = gui.exe_file
+            if progName is not None:
+                search = frame
+                while search is not None:
+                    if progName in search.f_code.co_filename:
+                        callFrame = "Line " + str(search.f_lineno)
                         break
-            except: pass
-
-            if callFrame != "":
-                callFrame = "Line " + str(callFrame[2])
+                    search = search.f_back
 
             # user generated call
-            if "appjar.py" not in frames[2][1] or frames[2][3] == "handlerFunction":
+            if "appjar.py" not in caller.f_code.co_filename or caller.f_code.co_name == "handlerFunction":
                 if callFrame != "":
                     msg = "[" + callFrame + "]: "+str(msg)
 
             # appJar logging
             else:
                 if callFrame != "":
-                    msg = "["+callFrame + "->" + str(frames[2][2]) +"/"+str(frames[2][3])+"]: "+str(msg)
+                    msg = "["+callFrame + "->" + str(caller.f_lineno) +"/"+caller.f_code.co_name+"]: "+str(msg)
                 else:
-                    msg = "["+str(frames[2][2]) +"/"+str(frames[2][3])+"]: "+str(msg)
+                    msg = "["+str(caller.f_lineno) +"/"+caller.f_code.co_name+"]: "+str(msg)
+        del frame, caller
 
-        logger = logging.getLogger("appJar")
-        level = level.upper()
-
-        if level == "EXCEPTION": logger.exception(msg, *args)
-        elif level == "CRITICAL": logger.critical(msg, *args)
-        elif level == "ERROR": logger.error(msg, *args)
-        elif level == "WARNING": logger.warning(msg, *args)
-        elif level == "INFO": logger.info(msg, *args)
-        elif level == "DEBUG": logger.debug(msg, *args)
-        elif level == "TRACE": logger.trace(msg, *args)
+        if level == "EXCEPTION": appJarLogger.exception(msg, *args)
+        else: appJarLogger.log(levelNo, msg, *args)
 
 ##############################################################
 # Event Loop - must always be called at end
@@ -2125,6 +2204,17 @@ class gui(object):
                 self.topLevel.after_cancel(self.preloadAnimatedImageId)
             if self.processQueueId:
                 self.topLevel.after_cancel(self.processQueueId)
+            # stop watching the wake pipe - it's left open, as worker threads might still write to it
+            if self.eventWakeFds is not None:
+                self.topLevel.tk.deletefilehandler(self.eventWakeFds[0])
+
+            # stop the asyncio event loop
+            if self.asyncLoop is not None:
+                self.asyncLoop.call_soon_threadsafe(self.asyncLoop.stop)
+
+            # stop any thread pools - functions that haven't started are cancelled
+            for pool in self.threadPools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
 
             # stop any animations
             for key in self.widgetManager.group(WIDGET_NAMES.AnimationID):
@@ -2200,35 +2290,154 @@ class gui(object):
         :param func: the function to call
         :param *args: any number of ordered arguments
         :param **kwargs: any number of named arguments
-        :raises Full: if unable to add the function to the queue
+        if the queue is full, worker threads wait up to EVENT_TIMEOUT ms for space, the main thread doesn't wait
+        functions that still don't fit are dropped (with a warning), and counted in getEventQueueStats()
         """
-        self._loadThreading()
-        if Queue is False:
-            gui.warn("Unable to queueFunction - threading not possible.")
-        else:
-            self.eventQueue.put((5, func, args, kwargs), block=False)
+        self._queueEvent(5, func, args, kwargs)
 
     def queuePriorityFunction(self, func, *args, **kwargs):
-        """ queues the function with a higher priority - not working yet """
+        """ queues the function with a higher priority
+        it will be actioned before any functions queued with queueFunction """
+        self._queueEvent(1, func, args, kwargs)
+
+    def _queueEvent(self, priority, func, args, kwargs):
+        """ internal function, safe to call from any thread - it only puts the function on the queue
+            the main thread picks it up the next time it drains the queue """
         self._loadThreading()
         if Queue is False:
             gui.warn("Unable to queueFunction - threading not possible.")
         else:
-            self.eventQueue.put((1, func, args, kwargs), block=False)
+            item = (priority, next(self.eventCounter), time.time(), func, args, kwargs)
+            try:
+                # the main thread can't wait for space - it's the only thread that makes any
+                if current_thread().name == "MainThread":
+                    self.eventQueue.put(item, block=False)
+                else:
+                    self.eventQueue.put(item, timeout=self.EVENT_TIMEOUT / 1000.0)
+            except Queue.Full:
+                with self.eventStatsLock:
+                    self.eventStats["dropped"] += 1
+                gui.warn("Event queue full - dropped queued function: %s", func)
+                return
+
+            # wake the main thread, unless a wake is already on its way
+            # only a byte is written to the pipe - no Tk calls, so it's safe from any thread
+            if self.eventWakeFds is not None and not self.eventWakePending:
+                self.eventWakePending = True
+                try:
+                    os.write(self.eventWakeFds[1], b"!")
+                except OSError:
+                    pass
+
+    def setEventBudget(self, budget):
+        """ set how long (in ms) queued functions can run for, before the GUI gets to redraw & handle input """
+        self.EVENT_BUDGET = budget
+
+    def getEventQueueStats(self):
+        """ returns a dictionary of event queue stats:
+            depth (functions waiting), maxDepth (the deepest the queue was when drained), processed, drains,
+            dropped (functions that didn't fit in a full queue),
+            averageLatency & maxLatency (ms from being queued to being run),
+            lastBatch & lastBatchTime (functions run by the last drain, and how long it took in ms) """
+        self._loadThreading()
+        if Queue is False: return {}
+        stats = self.eventStats
+        return {
+            "depth": self.eventQueue.qsize(),
+            "maxDepth": stats["maxDepth"],
+            "processed": stats["processed"],
+            "drains": stats["drains"],
+            "dropped": stats["dropped"],
+            "averageLatency": stats["totalLatency"] * 1000 / stats["processed"] if stats["processed"] else 0.0,
+            "maxLatency": stats["maxLatency"] * 1000,
+            "lastBatch": stats["lastBatch"],
+            "lastBatchTime": stats["lastBatchTime"] * 1000,
+        }
+
+    def _startEventQueue(self):
+        """ internal function, the first drain of the event queue
+            runs on the main thread, so it's where Tk starts watching the wake pipe """
+        self._watchEventWake()
+        self._processEventQueue()
+
+    def _watchEventWake(self):
+        """ internal function, opens a pipe that worker threads write a byte to, when they queue a function
+            Tk watches the other end, and drains the queue as soon as it's readable
+            not possible without file handlers (eg. on Windows) - the queue is then checked every EVENT_SPEED ms """
+        try:
+            readFd, writeFd = os.pipe()
+        except (AttributeError, OSError):
+            return
+        try:
+            self.topLevel.tk.createfilehandler(readFd, READABLE, self._eventWoken)
+        except Exception:
+            os.close(readFd)
+            os.close(writeFd)
+            return
+        self.eventWakeFds = (readFd, writeFd)
+
+    def _eventWoken(self, readFd, mask):
+        """ internal function, called by Tk on the main thread when a worker thread has written to the wake pipe """
+        os.read(readFd, 4096)
+        # cleared before draining, so a function queued during the drain wakes it again
+        self.eventWakePending = False
+        if not self.alive: return
+        if self.processQueueId:
+            self.after_cancel(self.processQueueId)
+        self._processEventQueue()
 
     def _processEventQueue(self):
         """ internal function to process events in the event queue
-            put there by queue function """
+            put there by queue function
+            runs as many as fit in EVENT_BUDGET ms, then lets the GUI update before carrying on """
         if not self.alive: return
-        if not self.eventQueue.empty():
-            priority, func, args, kwargs = self.eventQueue.get()
-            gui.trace("FUNCTION: %s(%s)", func, args)
-            func(*args, **kwargs)
+        stats = self.eventStats
+        # the queue only grows between drains, so it's deepest now
+        # measured here, on the main thread, so worker threads never update maxDepth
+        depth = self.eventQueue.qsize()
+        if depth > stats["maxDepth"]:
+            stats["maxDepth"] = depth
+        start = time.time()
+        deadline = start + self.EVENT_BUDGET / 1000.0
+        processed = 0
+        # checked once, rather than building a log message for every function
+        tracing = appJarLogger.isEnabledFor(TRACE)
+        while True:
+            try:
+                priority, number, queued, func, args, kwargs = self.eventQueue.get_nowait()
+            except Queue.Empty:
+                break
+            now = time.time()
+            latency = now - queued
+            stats["totalLatency"] += latency
+            if latency > stats["maxLatency"]:
+                stats["maxLatency"] = latency
+            if tracing: gui.trace("FUNCTION: %s(%s)", func, args)
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                gui.exception("Error running queued function: %s", func)
+            processed += 1
+            if time.time() >= deadline:
+                break
+
+        stats["processed"] += processed
+        stats["drains"] += 1
+        stats["lastBatch"] = processed
+        stats["lastBatchTime"] = time.time() - start
 
-        self.processQueueId = self.after(self.EVENT_SPEED, self._processEventQueue)
+        # carry on straight after the GUI has updated, if there's more to do
+        # otherwise, wait for a worker thread to wake it up, or check again in EVENT_SPEED ms if they can't
+        if not self.eventQueue.empty():
+            self.processQueueId = self.after(1, self._processEventQueue)
+        elif self.eventWakeFds is not None:
+            self.processQueueId = None
+        else:
+            self.processQueueId = self.after(self.EVENT_SPEED, self._processEventQueue)
 
     def thread(self, func, *args, **kwargs):
         """ will run the supplied function in a separate thread
+            use submitThread to run it on a pool of threads instead
 
         param func: the function to run
         """
@@ -2240,6 +2449,66 @@ class gui(object):
             t.daemon = True
             t.start()
 
+    def setThreadPool(self, name, workers):
+        """ sets how many threads a named pool can have - must be called before the pool is first used """
+        self.threadPoolSizes[name] = workers
+
+    def submitThread(self, func, args=(), kwargs=None, pool="default", key=None, callback=None):
+        """ runs func(*args, **kwargs) on a named pool of worker threads,
+            so at most that many functions run at once, and threads are reused
+            the workers are daemon threads, so a function that never finishes won't stop the program exiting
+
+        :param pool: the name of the pool (see setThreadPool)
+        :param key: latest wins - a function submitted earlier with the same key is cancelled
+            if it hasn't started yet, and its result is ignored if it has
+        :param callback: called with the result on the GUI's main thread, through the event queue
+        :returns: a Future (or None, if thread pools aren't available)
+        """
+        self._loadThreading()
+        if kwargs is None: kwargs = {}
+        if Queue is False:
+            gui.warn("Unable to queueFunction - threading not possible.")
+            return None
+        elif futures is False:
+            # no thread pools - fall back to a new thread for every function
+            def innerThread():
+                result = func(*args, **kwargs)
+                if callback is not None: self.queueFunction(callback, result)
+            t = Thread(group=None, target=innerThread, name=None)
+            t.daemon = True
+            t.start()
+            return None
+
+        with self.threadLock:
+            executor = self.threadPools.get(pool)
+            if executor is None:
+                executor = DaemonThreadPool(self.threadPoolSizes.get(pool, self.threadPoolSizes["default"]), "appJar-" + str(pool))
+                self.threadPools[pool] = executor
+            future = executor.submit(func, *args, **kwargs)
+            previous = None
+            if key is not None:
+                previous = self.latestThreads.get(key)
+                self.latestThreads[key] = future
+        if previous is not None:
+            previous.cancel()
+        future.add_done_callback(lambda done: self._threadDone(done, key, callback))
+        return future
+
+    def _threadDone(self, future, key, callback):
+        """ internal function, called when a submitted function finishes (or is cancelled) """
+        if key is not None:
+            with self.threadLock:
+                latest = self.latestThreads.get(key) is future
+                if latest: del self.latestThreads[key]
+            # a newer function was submitted with the same key
+            if not latest: return
+        if future.cancelled(): return
+        error = future.exception()
+        if error is not None:
+            gui.error("Error in thread: %s", repr(error))
+        elif callback is not None:
+            self.queueFunction(callback, future.result())
+
     def callback(self, *args, **kwargs):
         """Shortner for threadCallback."""
         return self.threadCallback(*args, **kwargs)
@@ -2262,6 +2531,83 @@ class gui(object):
             return
         self.thread(innerThread, func, callback, *args, **kwargs)
 
+#####################################
+# Functions for running coroutines
+#####################################
+    def _loadAsync(self):
+        """ loads asyncio, and starts an event loop on its own thread
+            the event loop runs alongside the GUI's main loop, and is stopped with it
+            so any number of coroutines can be waiting on network or file operations, with just one thread """
+        global asyncio
+        self._loadThreading()
+        if asyncio is None:
+            try:
+                import asyncio
+            except ImportError:
+                asyncio = False
+        if asyncio is False or Queue is False:
+            return None
+
+        with self.threadLock:
+            if self.asyncLoop is None:
+                self.asyncLoop = asyncio.new_event_loop()
+                self.asyncThread = Thread(group=None, target=self._runAsyncLoop, name="appJar-asyncio")
+                self.asyncThread.daemon = True
+                self.asyncThread.start()
+        return self.asyncLoop
+
+    def _runAsyncLoop(self):
+        """ internal function, runs the asyncio event loop until the GUI stops """
+        asyncio.set_event_loop(self.asyncLoop)
+        self.asyncLoop.run_forever()
+
+    def runAsync(self, coroutine, callback=None):
+        """ schedules a coroutine on the GUI's asyncio event loop
+
+        :param coroutine: the coroutine to run, eg. fetch(url)
+        :param callback: called with its result on the GUI's main thread, through the event queue
+        :returns: a Future - call its cancel() to cancel the coroutine
+        """
+        loop = self._loadAsync()
+        if loop is None:
+            gui.warn("Unable to runAsync - asyncio not available.")
+            return None
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        future.add_done_callback(lambda done: self._threadDone(done, None, callback))
+        return future
+
+    def callOnGui(self, func, *args, **kwargs):
+        """ for use in coroutines run with runAsync: runs func(*args, **kwargs) on the GUI's main thread
+            returns an awaitable, which gives the result, eg. value = await app.callOnGui(app.getEntry, "name")
+            raises an Exception if the asyncio bridge isn't running (no asyncio, or the GUI has stopped)
+            rather than returning something that can't be awaited """
+        loop = self._loadAsync()
+        if loop is None:
+            raise Exception("Unable to callOnGui - the asyncio bridge isn't running: asyncio not available.")
+        if not self.alive:
+            raise Exception("Unable to callOnGui - the asyncio bridge isn't running: the GUI has stopped.")
+        future = loop.create_future()
+
+        def settle(result, error):
+            if not future.cancelled():
+                if error is not None: future.set_exception(error)
+                else: future.set_result(result)
+
+        def runOnGui():
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                loop.call_soon_threadsafe(settle, None, e)
+            else:
+                loop.call_soon_threadsafe(settle, result, None)
+
+        self.queueFunction(runOnGui)
+        return future
+
+    def updateOnGui(self, func, *args, **kwargs):
+        """ for use in coroutines run with runAsync: queues func(*args, **kwargs) to run on the GUI's main thread, without waiting for it """
+        self.queueFunction(func, *args, **kwargs)
+
     # internal function, called by 'after' function, after sleeping
     def _poll(self):
         """ internal function, called by 'after' function, after sleeping """
@@ -7342,7 +7688,7 @@ class gui(object):
 
         # first check over image & cache it
         fullPath = self.getImagePath(overImg)
-        self.topLevel.after(0, self._getImage, fullPath)
+        self.preloadImage(fullPath)
 
         leaveImg = lab.image.path
         lab.bind("<Leave>", lambda e: self.setImage(title, leaveImg, True))
@@ -7379,7 +7725,7 @@ class gui(object):
             return True
 
         # modification time has changed
-        if originalImage.modTime != os.path.getmtime(newAbsImage):
+        if originalImage.modTime != self.imageCache.modTime(newAbsImage):
             return True
 
         # no changes
@@ -7387,7 +7733,19 @@ class gui(object):
 
     # function to remove image objects form cache
     def clearImageCache(self):
-        self.widgetManager.clear(WIDGET_NAMES.ImageCache)
+        self.imageCache.clear()
+
+    def setImageCacheSize(self, megabytes):
+        """ sets how much memory decoded images can use, before the least recently used are dropped from the cache """
+        self.imageCache.setMaxBytes(int(megabytes * 1024 * 1024))
+
+    def setImageStatInterval(self, seconds):
+        """ sets how long an image file's modification time is trusted, before checking the file again """
+        self.imageCache.statInterval = seconds
+
+    def getImageCacheStats(self):
+        """ returns a dictionary of the image cache's size, hits, misses & evictions """
+        return self.imageCache.getStats()
 
     # internal function to build an image function from a string
     def _getImageData(self, imageData, fmt="gif"):
@@ -7417,6 +7775,45 @@ class gui(object):
         imgObj.animating = False
         return imgObj
 
+    # internal function to check an image file, returns its type: gif, ppm, jpeg or png
+    def _checkImageFile(self, imagePath):
+        if not os.path.isfile(imagePath):
+            raise Exception("Image " + imagePath + " does not exist")
+        if not os.access(imagePath, os.R_OK):
+            raise Exception("Can't read image: " + imagePath)
+
+        imgType = imghdr.what(imagePath)
+        if imgType is None:
+            raise Exception( "Invalid file: " + imagePath + " is not a valid image")
+        elif not imagePath.lower().endswith(imgType) and not (
+                imgType == "jpeg" and imagePath.lower().endswith("jpg")):
+                # the image has been saved with the wrong extension
+            raise Exception(
+                "Invalid image extension: " +
+                imagePath +
+                " should be a ." +
+                imgType)
+        elif imagePath.lower().endswith('.gif'):
+            return "gif"
+        elif imagePath.lower().endswith('.ppm') or imagePath.lower().endswith('.pgm'):
+            return "ppm"
+        elif imagePath.lower().endswith('jpg') or imagePath.lower().endswith('jpeg'):
+            self._loadNanojpeg()
+            if nanojpeg is False:
+                raise Exception(
+                    "nanojpeg library not found, unable to display jpeg files: " + imagePath)
+            return "jpeg"
+        elif imagePath.lower().endswith('.png'):
+            # known issue here, some PNGs lack IDAT chunks
+            try:
+                from appJar.lib import png
+            except:
+                raise Exception(
+                    "PNG library not found, PNG files not supported: " + imagePath)
+            return "png"
+        else:
+            raise Exception("Invalid image type: " + imagePath)
+
     # internal function to check/build image object
     def _getImage(self, imagePath, checkCache=True, addToCache=True):
         if imagePath is None:
@@ -7425,74 +7822,94 @@ class gui(object):
         # get the full image path
         imagePath = self.getImagePath(imagePath)
 
-        # if we're caching, and we have a non-None entry in the cache - get it...
-        photo = None
-        if checkCache and imagePath in self.widgetManager.group(WIDGET_NAMES.ImageCache) and self.widgetManager.get(WIDGET_NAMES.ImageCache, imagePath) is not None:
-            photo = self.widgetManager.get(WIDGET_NAMES.ImageCache, imagePath)
+        # if we're caching, and the image hasn't changed since it was cached - use it
+        if checkCache:
+            photo = self.imageCache.get(imagePath)
+            if photo is not None:
+                return photo
 
-        # if the image hasn't changed, use the cache
-        if not self.hasImageChanged(photo, imagePath):
-            pass
-        # else load a new one
-        elif os.path.isfile(imagePath):
-            if os.access(imagePath, os.R_OK):
-                imgType = imghdr.what(imagePath)
-                if imgType is None:
-                    raise Exception( "Invalid file: " + imagePath + " is not a valid image")
-                elif not imagePath.lower().endswith(imgType) and not (
-                        imgType == "jpeg" and imagePath.lower().endswith("jpg")):
-                        # the image has been saved with the wrong extension
-                    raise Exception(
-                        "Invalid image extension: " +
-                        imagePath +
-                        " should be a ." +
-                        imgType)
-                elif imagePath.lower().endswith('.gif'):
-                    photo = PhotoImage(file=imagePath)
-                elif imagePath.lower().endswith('.ppm') or imagePath.lower().endswith('.pgm'):
-                    photo = PhotoImage(file=imagePath)
-                elif imagePath.lower().endswith('jpg') or imagePath.lower().endswith('jpeg'):
-                    self.warn("Image processing for .JPGs is slow. .GIF is the recommended format")
-                    photo = self.convertJpgToBmp(imagePath)
-                elif imagePath.lower().endswith('.png'):
-                    # known issue here, some PNGs lack IDAT chunks
-                    # also, PNGs seem broken on python<3, maybe around the map
-                    # function used to generate pixel maps
-                    self._importPngimagetk()
-                    if PngImageTk is False:
-                        raise Exception(
-                            "TKINTERPNG library not found, PNG files not supported: " + imagePath)
-                    if sys.version_info >= (2, 7):
-                        self.warn("Image processing for .PNGs is slow. .GIF is the recommended format")
-                        png = PngImageTk(imagePath)
-                        png.convert()
-                        photo = png.image
-                    else:
-                        raise Exception("PNG images only supported in python 3: " + imagePath)
-                else:
-                    raise Exception("Invalid image type: " + imagePath)
-            else:
-                raise Exception("Can't read image: " + imagePath)
+        imgType = self._checkImageFile(imagePath)
+        if imgType in ("gif", "ppm"):
+            photo = PhotoImage(file=imagePath)
         else:
-            raise Exception("Image " + imagePath + " does not exist")
+            self.warn("Image processing for .%ss is slow. .GIF is the recommended format, or use preloadImage/setImageAsync", "JPG" if imgType == "jpeg" else "PNG")
+            photo = self._photoFromPixels(_decodeImage(imagePath, imgType))
+
+        return self._storeImage(photo, imagePath, imgType, addToCache)
+
+    # internal function to build a PhotoImage from the pixels returned by _decodeImage
+    def _photoFromPixels(self, pixels):
+        data, transparent = pixels
+        photo = PhotoImage(data=data)
+        for y, start, end in transparent:
+            for x in range(start, end):
+                photo.tk.call(photo.name, "transparency", "set", x, y, True)
+        return photo
 
+    # internal function to finish a new image object, and cache it
+    def _storeImage(self, photo, imagePath, imgType, addToCache=True):
         # store the full path to this image
         photo.path = imagePath
         # store the modification time
-        photo.modTime = os.path.getmtime(imagePath)
+        photo.modTime = self.imageCache.modTime(imagePath)
 
         # sort out if it's an animated image
-        if self._checkIsAnimated(imagePath):
+        if imgType == "gif" and self._checkIsAnimated(imagePath):
             self._configAnimatedImage(photo)
             self._preloadAnimatedImage(photo)
         else:
             photo.isAnimated = False
             photo.animating = False
             if addToCache:
-                self.widgetManager.update(WIDGET_NAMES.ImageCache, imagePath, photo)
+                self.imageCache.put(imagePath, photo)
 
         return photo
 
+    def _loadImageAsync(self, imagePath, callback, key=None):
+        """ internal function, gets an image without decoding it on the main thread
+            callback is called with the image, on the main thread """
+        photo = self.imageCache.get(imagePath)
+        if photo is not None:
+            self.queueFunction(callback, photo)
+            return None
+
+        imgType = self._checkImageFile(imagePath)
+        if imgType in ("gif", "ppm"):
+            # Tk reads these quickly itself
+            self.queueFunction(lambda: callback(self._getImage(imagePath, False)))
+            return None
+
+        def decoded(pixels):
+            callback(self._storeImage(self._photoFromPixels(pixels), imagePath, imgType))
+
+        # one worker thread: decoding is pure python, so more threads wouldn't be quicker
+        return self.submitThread(_decodeImage, (imagePath, imgType), pool="images", key=key, callback=decoded)
+
+    def preloadImage(self, imageFile, callback=None):
+        """ decodes an image in the background, and puts it in the image cache
+            so it's ready the next time it's used
+
+        :param callback: called with the image, on the GUI's main thread
+        :returns: a Future, if the image is being decoded in the background
+        """
+        if callback is None: callback = lambda photo: None
+        return self._loadImageAsync(self.getImagePath(imageFile), callback)
+
+    def setImageAsync(self, name, imageFile):
+        """ like setImage, but a JPG or PNG is decoded in the background - the GUI keeps running
+            the current image is shown until the new one is ready, setting another image first cancels this one """
+        label = self.widgetManager.get(WIDGET_NAMES.Image, name)
+        imageFile = self.getImagePath(imageFile)
+
+        # only set the image if it's different
+        if label.image is not None and label.image.path == imageFile:
+            self.warn("Not updating %s, %s hasn't changed." , name, imageFile)
+            return None
+        elif imageFile is None:
+            return None
+        else:
+            return self._loadImageAsync(imageFile, lambda image: self._populateImage(name, image), key=(WIDGET_NAMES.Image, name))
+
     def getImageDimensions(self, name):
         img = self.widgetManager.get(WIDGET_NAMES.Image, name).image
         return img.width(), img.height()
@@ -7685,41 +8102,7 @@ class gui(object):
             raise Exception(
                 "JPG images only supported in python 2.7+: " + image)
         else:
-            # read the image into an array of bytes
-            with open(image, 'rb') as inFile:
-                buf = array.array(str('B'), inFile.read())
-
-            # init the translator, and decode the array of bytes
-            nanojpeg.njInit()
-            nanojpeg.njDecode(buf, len(buf))
-
-            # determine a file name & type
-            if nanojpeg.njIsColor():
-#                fileName = image.split('.jpg', 1)[0] + '.ppm'
-                param = 6
-            else:
-#                fileName = image.split('.jpg', 1)[0] + '.pgm'
-#                fileName = "test3.pgm"
-                param = 5
-
-            # create a string, starting with the header
-            val = "P%d\n%d %d\n255\n" % (
-                param, nanojpeg.njGetWidth(), nanojpeg.njGetHeight())
-            # append the bytes, converted to chars
-            val = str(val) + str('').join(map(chr, nanojpeg.njGetImage()))
-
-            # release any stuff
-            nanojpeg.njDone()
-
-            photo = PhotoImage(data=val)
-            return photo
-
-            # write the chars to a new file, if python3 we need to encode them first
-#            with open(fileName, "wb") as outFile:
-#                  if sys.version_info[0] == 2: outFile.write(val)
-#                  else: outFile.write(val.encode('ISO-8859-1'))
-#
-#            return fileName
+            return self._photoFromPixels(_decodeImage(image, "jpeg"))
 
     # function to set a background image
     # make sure this is done before everything else, otherwise it will cover
@@ -10129,6 +10512,20 @@ class gui(object):
         except AttributeError:
             gui.error("You can only change the number of rows in an AutoEntry, %s is not an AutoEntry.", title)
 
+    def setAutoEntryMaxMatches(self, title, maxMatches):
+        entry = self.widgetManager.get(WIDGET_NAMES.Entry, title)
+        try:
+            entry.setMaxMatches(maxMatches)
+        except AttributeError:
+            gui.error("You can only change the number of matches in an AutoEntry, %s is not an AutoEntry.", title)
+
+    def setAutoEntrySeparator(self, title, separator):
+        entry = self.widgetManager.get(WIDGET_NAMES.Entry, title)
+        try:
+            entry.setSeparator(separator)
+        except AttributeError:
+            gui.error("You can only set the separator of an AutoEntry, %s is not an AutoEntry.", title)
+
     def _validateNumericEntry(self, action, index, value_if_allowed, prior_value, text, validation_type, trigger_type, widget_name):
         if action == "1":
             if str(text) in '0123456789.-+':
@@ -12010,8 +12407,7 @@ class gui(object):
 
             def __init__(self, words, tl, *args, **kwargs):
                 super(AutoCompleteEntry, self).__init__(*args, **kwargs)
-                self.allWords = words
-                self.allWords.sort()
+                self.indexWords(words)
                 self.topLevel = tl
 
                 # store variable - so we can see when it changes
@@ -12029,6 +12425,10 @@ class gui(object):
                 # no list box - yet
                 self.listBoxShowing = False
                 self.rows = 10
+                # most words to show in the list box
+                self.maxMatches = 100
+                # if set, several words can be typed - only the text after the last separator is completed
+                self.separator = None
 
             # customised config setters
             def config(self, cnf=None, **kw):
@@ -12043,38 +12443,65 @@ class gui(object):
                 # propagate anything left
                 super(AutoCompleteEntry, self).config(cnf, **kw)
 
+            # words are kept sorted by their lower case form (in wordKeys)
+            # so the words starting with the typed text can be found with a binary search
+            def indexWords(self, words):
+                self.allWords = sorted(set(words), key=lambda word: (word.lower(), word))
+                self.wordKeys = [word.lower() for word in self.allWords]
+
             def removeWord(self, word):
-                if word in self.allWords:
-                    self.allWords.remove(word)
+                key = word.lower()
+                pos = bisect_left(self.wordKeys, key)
+                while pos < len(self.wordKeys) and self.wordKeys[pos] == key:
+                    if self.allWords[pos] == word:
+                        del self.allWords[pos]
+                        del self.wordKeys[pos]
+                        return
+                    pos += 1
 
             def addWords(self, words):
                 if not hasattr(words, "__iter__"):
                     words = [words]
-                for word in words:
-                    if word not in self.allWords:
-                        self.allWords.append(word)
-                self.allWords.sort()
+                self.indexWords(self.allWords + list(words))
 
             def changeWords(self, words):
-                self.allWords = words
-                self.allWords.sort()
+                self.indexWords(words)
 
             def setNumRows(self, rows):
                 self.rows = rows
 
+            def setMaxMatches(self, maxMatches):
+                self.maxMatches = maxMatches
+
+            def setSeparator(self, separator):
+                self.separator = separator
+
+            # the text being completed - after the last separator, if there is one
+            def typedWord(self):
+                text = self.var.get()
+                if self.separator:
+                    text = text.split(self.separator)[-1]
+                return text.lstrip()
+
             # function to see if words match
             def checkMatch(self, fieldValue, acListEntry):
-                pattern = re.compile(re.escape(fieldValue) + '.*', re.IGNORECASE)
-                return re.match(pattern, acListEntry)
+                return acListEntry.lower().startswith(fieldValue.lower())
 
-            # function to get all matches as a list
+            # function to get all matches as a list (at most maxMatches of them)
             def getMatches(self):
-                return [w for w in self.allWords if self.checkMatch(self.var.get(), w)]
+                prefix = self.typedWord().lower()
+                pos = bisect_left(self.wordKeys, prefix)
+                end = min(len(self.wordKeys), pos + self.maxMatches)
+                matches = []
+                while pos < end and self.wordKeys[pos].startswith(prefix):
+                    matches.append(self.allWords[pos])
+                    pos += 1
+                return matches
 
             # called when typed in entry
             def textChanged(self, name, index, mode):
                 # if no text - close list
-                if self.var.get() == '':
+                if self.typedWord() == '':
                     self.closeList()
                 else:
                     if not self.listBoxShowing:
@@ -12123,7 +12550,9 @@ class gui(object):
             # copy word from list to entry, close list
             def selectWord(self, event):
                 if self.listBoxShowing:
-                    self.var.set(self.listbox.get(ACTIVE))
+                    # keep any words before the one being completed
+                    text = self.var.get()
+                    self.var.set(text[:len(text) - len(self.typedWord())] + self.listbox.get(ACTIVE))
                     self.icursor(END)
                     self.closeList()
                 return "break"
@@ -15221,7 +15650,9 @@ class GoogleMap(LabelFrame, object):
         self.rawData = None
         self.mapData = None
         self.request = None
-        self.app.thread(self.getMapData)
+        # the number of the latest map requested - older requests stop retrying
+        self.mapRequest = 0
+        self._requestMapData()
 
         self.updateMapId = self.parent.after(500, self.updateMap)
 
@@ -15354,13 +15785,13 @@ class GoogleMap(LabelFrame, object):
 
     def removeMarkers(self):
         self.markers = []
-        self.app.thread(self.getMapData)
+        self._requestMapData()
 
     def removeMarker(self, label):
         for p, v in enumerate(self.markers):
             if v.get("label") == label:
                 del self.markers[p]
-                self.app.thread(self.getMapData)
+                self._requestMapData()
                 return
 
     def addMarker(self, location, size=None, colour=None, label=None, replace=False):
@@ -15384,7 +15815,7 @@ class GoogleMap(LabelFrame, object):
         else:
             self.markers[-1] = {"location":location, "size":size, "colour":colour, "label":label}
 
-        self.app.thread(self.getMapData)
+        self._requestMapData()
 
     def saveTile(self, location):
         if self.rawData is not None:
@@ -15403,7 +15834,7 @@ class GoogleMap(LabelFrame, object):
     def setSize(self, size):
         if size != self.params["size"]:
             self.params["size"] = str(size).lower()
-            self.app.thread(self.getMapData)
+            self._requestMapData()
 
     def changeTerrain(self, terrainType):
         terrainType = terrainType.title()
@@ -15411,26 +15842,26 @@ class GoogleMap(LabelFrame, object):
             self.terrainType.set(terrainType)
             if self.params["maptype"] != self.terrainType.get().lower():
                 self.params["maptype"] = self.terrainType.get().lower()
-                self.app.thread(self.getMapData)
+                self._requestMapData()
 
     def changeLocation(self, location):
         self.location.set(location) # update the entry
         if self.params["center"] != location:
             self.params["center"] = location
-            self.app.thread(self.getMapData)
+            self._requestMapData()
 
     def setZoom(self, zoom):
         if 0 <= zoom <= 22:
             self.params["zoom"] = zoom
-            self.app.thread(self.getMapData)
+            self._requestMapData()
 
     def zoom(self, mod):
         if mod == "+" and self.params["zoom"] < 22:
             self.params["zoom"] += 1
-            self.app.thread(self.getMapData)
+            self._requestMapData()
         elif mod == "-" and self.params["zoom"] > 0:
             self.params["zoom"] -= 1
-            self.app.thread(self.getMapData)
+            self._requestMapData()
 
     def updateMap(self):
         if not self.alive: return
@@ -15482,13 +15913,19 @@ class GoogleMap(LabelFrame, object):
         req = self.GEO_URL + urlencode(p)
         return req
 
-    def getMapData(self):
+    def _requestMapData(self):
+        """ downloads the map on the GoogleMap thread pool - only the latest request counts,
+            so bursts of zooming & panning don't pile up downloads """
+        self.mapRequest += 1
+        self.app.submitThread(self.getMapData, (self.mapRequest,), pool="GoogleMap", key=self)
+
+    def getMapData(self, request=None):
         """ will query GoogleMaps & download the image data as a blob """
         if self.params['center'] == "":
             self.params["center"] = self.currentLocation
         self._buildQueryURL()
         gotMap = False
-        while not gotMap:
+        while not gotMap and (request is None or request == self.mapRequest) and self.alive:
             if self.request is not None:
                 if self.proxyString is not None:
                     gui.error("Proxy set, but not enabled.")
@@ -15780,6 +16217,211 @@ class DraggableWidget(object):
         else:
             gui.trace("<<DRAGGABLE_WIDGET.restoreOldData>> unable to restore - NO OriginalID")
 
+#########################################
+# DaemonThreadPool - used by submitThread
+#########################################
+
+class DaemonThreadPool(object):
+    """ a pool of worker threads, returning concurrent.futures Futures - like a ThreadPoolExecutor,
+        but the workers are daemon threads, so they never stop the program from exiting
+        workers are started as needed, up to maxWorkers """
+
+    def __init__(self, maxWorkers, name="appJar-pool"):
+        self.maxWorkers = max(1, maxWorkers)
+        self.name = name
+        self.work = Queue.Queue()
+        self.workers = []
+        self.idle = 0
+        self.lock = Lock()
+        self.stopped = False
+
+    def submit(self, func, *args, **kwargs):
+        future = futures.Future()
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError("cannot submit to " + self.name + " after shutdown")
+            self.work.put((future, func, args, kwargs))
+            if self.idle < self.work.qsize() and len(self.workers) < self.maxWorkers:
+                worker = Thread(target=self._run, name=self.name + "-" + str(len(self.workers)))
+                worker.daemon = True
+                self.workers.append(worker)
+                worker.start()
+        return future
+
+    def _run(self):
+        while True:
+            with self.lock: self.idle += 1
+            item = self.work.get()
+            with self.lock: self.idle -= 1
+            if item is None: return
+            future, func, args, kwargs = item
+            if not future.set_running_or_notify_cancel(): continue
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def shutdown(self, wait=False, cancel_futures=True):
+        """ stops the workers, once they finish what they're running
+            functions that haven't started are cancelled """
+        with self.lock:
+            self.stopped = True
+            workers = list(self.workers)
+        if cancel_futures:
+            while True:
+                try:
+                    item = self.work.get_nowait()
+                except Queue.Empty:
+                    break
+                if item is not None: item[0].cancel()
+        for worker in workers:
+            self.work.put(None)
+        if wait:
+            for worker in workers: worker.join()
+
+#########################################
+# ImageCache - used to store decoded images
+#########################################
+
+class ImageCache(object):
+    """ keeps decoded images (PhotoImages), up to a total size in bytes
+        the least recently used images are dropped first
+        modification times are only checked once every statInterval seconds """
+
+    def __init__(self, maxBytes=32 * 1024 * 1024, statInterval=1.0):
+        from collections import OrderedDict
+        self.images = OrderedDict()  # path -> image, least recently used first
+        self.sizes = {}
+        self.modTimes = {}  # path -> (time checked, modification time)
+        self.totalBytes = 0
+        self.maxBytes = maxBytes
+        self.statInterval = statInterval
+        self.hits = self.misses = self.evictions = 0
+
+    def modTime(self, path):
+        """ returns the modification time of a file, checking the file at most once every statInterval seconds """
+        now = time.time()
+        checked = self.modTimes.get(path)
+        if checked is not None and now - checked[0] < self.statInterval:
+            return checked[1]
+        modTime = os.path.getmtime(path)
+        self.modTimes[path] = (now, modTime)
+        return modTime
+
+    def get(self, path):
+        """ returns the cached image, or None if it's not cached, or the file has changed since """
+        photo = self.images.get(path)
+        if photo is not None:
+            try:
+                changed = photo.modTime != self.modTime(path)
+            except OSError:
+                changed = True
+            if changed:
+                self.forget(path)
+                photo = None
+        if photo is None:
+            self.misses += 1
+            return None
+
+        # it's now the most recently used
+        self.images[path] = self.images.pop(path)
+        self.hits += 1
+        return photo
+
+    def put(self, path, photo):
+        """ caches an image - images bigger than the whole cache aren't kept """
+        self.forget(path)
+        # a PhotoImage keeps 4 bytes for every pixel
+        size = photo.width() * photo.height() * 4
+        if size > self.maxBytes: return
+        self.images[path] = photo
+        self.sizes[path] = size
+        self.totalBytes += size
+        self._evict()
+
+    def forget(self, path):
+        if path in self.images:
+            del self.images[path]
+            self.totalBytes -= self.sizes.pop(path)
+
+    def setMaxBytes(self, maxBytes):
+        self.maxBytes = maxBytes
+        self._evict()
+
+    def _evict(self):
+        while self.totalBytes > self.maxBytes:
+            oldest = next(iter(self.images))
+            self.forget(oldest)
+            self.modTimes.pop(oldest, None)
+            self.evictions += 1
+
+    def clear(self):
+        self.images.clear()
+        self.sizes.clear()
+        self.modTimes.clear()
+        self.totalBytes = 0
+
+    def getStats(self):
+        return {"images": len(self.images), "bytes": self.totalBytes, "maxBytes": self.maxBytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+# nanojpeg keeps its decoder in a global, so only one JPG can be decoded at a time
+# (by the "images" worker, and by _getImage or convertJpgToBmp on the main thread)
+try:
+    from threading import Lock as _Lock
+    _nanojpegLock = _Lock()
+except ImportError:
+    # no threads - so no decodes at the same time either
+    _nanojpegLock = None
+
+def _decodeImage(imagePath, imgType):
+    """ decodes a JPG or PNG file, usually on a worker thread, so this mustn't use Tk
+        returns the image as PPM/PGM data, and the runs of transparent pixels in each row: (y, start, end) """
+    transparent = []
+    if imgType == "jpeg":
+        from appJar.lib import nanojpeg
+        import array
+        # read the image into an array of bytes
+        with open(imagePath, 'rb') as inFile:
+            buf = array.array(str('B'), inFile.read())
+
+        # init the translator, and decode the array of bytes
+        if _nanojpegLock is not None: _nanojpegLock.acquire()
+        try:
+            nanojpeg.njInit()
+            nanojpeg.njDecode(buf, len(buf))
+            header = "P%d\n%d %d\n255\n" % (6 if nanojpeg.njIsColor() else 5, nanojpeg.njGetWidth(), nanojpeg.njGetHeight())
+            data = header.encode("ascii") + bytes(bytearray(nanojpeg.njGetImage()))
+            nanojpeg.njDone()
+        finally:
+            if _nanojpegLock is not None: _nanojpegLock.release()
+        return data, transparent
+
+    from appJar.lib import png
+    width, height, rows, meta = png.Reader(imagePath).asRGBA8()
+    pixels = bytearray(3 * width * height)
+    rowSize = 3 * width
+    for y, row in enumerate(rows):
+        row = bytearray(row)
+        offset = y * rowSize
+        # drop the alpha byte of every pixel
+        for channel in range(3):
+            pixels[offset + channel:offset + rowSize:3] = row[channel::4]
+
+        # like PngImageTk - alpha is opaque or transparent only
+        if meta["alpha"]:
+            alpha = row[3::4]
+            start = alpha.find(b"\x00")
+            while start != -1:
+                end = start + 1
+                while end < width and alpha[end] == 0: end += 1
+                transparent.append((y, start, end))
+                start = alpha.find(b"\x00", end)
+    header = "P6\n%d %d\n255\n" % (width, height)
+    return header.encode("ascii") + bytes(pixels), transparent
+
 #########################################
 # Enum & WidgetManager - used to store widget lists
 #########################################
@@ -0,0 +1,41 @@
+# HEAP SORT MICROBENCHMARK
+# Compares the original, recursive "heapSort" (which rearranges location views and reads ".chompability" on every comparison)
+# with the bottom-up "fastHeapSort" on a flat list of values, on the same random chompability values.
+# Run from the "src" folder with "python benchmarks/heapsort.py [number of locations] [number of repeats]".
+import os.path
+import random
+import sys
+import time
+from array import array
+
+# Making the modules in the "src" folder importable when this file is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sorting
+
+def timeSort(sortOrder, keys, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        ranking = sortOrder(keys)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, ranking
+
+if __name__ == "__main__":
+    numLocations = int(sys.argv[1]) if len(sys.argv) > 1 else 150346
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    # Random values shaped like chompability: mostly small, with a long tail and plenty of ties.
+    random.seed(3530)
+    keys = array("d", [round(random.expovariate(0.01), 2) for _ in range(numLocations)])
+
+    print("Sorting " + str(numLocations) + " values (best of " + str(repeats) + "):")
+    results = {}
+    for name, sortOrder in (("recursive heapSort", sorting.recursiveHeapSortOrder), ("fastHeapSort", sorting.heapSortOrder)):
+        seconds, ranking = timeSort(sortOrder, keys, repeats)
+        results[name] = seconds
+        # Both must put the values in the same (ascending) order.
+        assert all(keys[ranking[i]] <= keys[ranking[i + 1]] for i in range(len(ranking) - 1))
+        print("  " + name.ljust(20) + format(seconds, ".3f") + " s")
+    print("  speedup: " + format(results["recursive heapSort"] / results["fastHeapSort"], ".1f") + "x")
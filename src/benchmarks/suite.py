@@ -0,0 +1,210 @@
+# BENCHMARK SUITE
+# Times every phase of a Chomp! query on synthetic, Yelp-shaped datasets of several sizes, and saves the results as JSON,
+# so two commits can be compared phase by phase:
+#   load.parse, load.merge   reading and parsing the .json file (see "loader.py")
+#   load.construct           building the LocationStore from the parsed records
+#   load.snapshot            writing the snapshot, and load.reopen: opening it and building a store on top of it (see "snapshot.py")
+#   index.build              building the category, state and city indexes (see "indexes.py")
+#   chompify                 scoring every location (see "scoring.py")
+#   sort.<algorithm>         ranking every location with each sort type (see "sorting.py")
+#   select.topK              selecting the top 100 locations without a full sort
+#   filter.match             finding the locations that match a typical query (see "query.py")
+#   filter.run               answering that query: filtering, scoring and picking the top 100
+# Every phase is run "--repeats" times; the best and the median times are kept.
+# Run from the "src" folder with, for example:
+#   python benchmarks/suite.py --sizes 1000 10000 --output before.json
+#   python benchmarks/suite.py --sizes 1000 10000 --output after.json --compare before.json
+# Datasets are generated once (with a fixed seed, so every run uses the same data) and kept in "--data" (benchmarks/data by default).
+import argparse
+import json
+import os
+import os.path
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# Making the modules in the "src" folder importable when this file is run as a script.
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC)
+import loader
+import scoring
+import snapshot
+import sorting
+from indexes import LocationIndexes
+from locationstore import LocationStore
+from query import Query, QueryEngine
+
+DEFAULT_SIZES = [1000, 10000, 150000, 1000000]
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SEED = 3530
+# A phase is reported as a regression (by "--compare") when it is this much slower than before.
+REGRESSION_RATIO = 1.10
+
+# The cities of the real dataset's metro areas (with a rough center), and its most common categories
+# (the rest of the 1300+ categories are filled in with generated names).
+CITIES = [
+    ("Philadelphia", "PA", 39.95, -75.16), ("Tampa", "FL", 27.95, -82.46), ("Indianapolis", "IN", 39.77, -86.16),
+    ("Nashville", "TN", 36.16, -86.78), ("Tucson", "AZ", 32.22, -110.97), ("New Orleans", "LA", 29.95, -90.07),
+    ("Edmonton", "AB", 53.55, -113.49), ("Saint Louis", "MO", 38.63, -90.20), ("Reno", "NV", 39.53, -119.81),
+    ("Boise", "ID", 43.62, -116.20), ("Santa Barbara", "CA", 34.42, -119.70), ("Gainesville", "FL", 29.65, -82.32),
+]
+COMMON_CATEGORIES = [
+    "Restaurants", "Food", "Shopping", "Home Services", "Beauty & Spas", "Nightlife", "Health & Medical", "Local Services",
+    "Bars", "Automotive", "Event Planning & Services", "Sandwiches", "American (Traditional)", "Active Life", "Pizza",
+    "Coffee & Tea", "Fast Food", "Breakfast & Brunch", "American (New)", "Hotels & Travel", "Mexican", "Italian", "Burgers",
+]
+CATEGORIES = COMMON_CATEGORIES + ["Category " + str(i) for i in range(1300)]
+
+# The query timed by the "filter" phases: a common category in one city.
+FILTER_QUERY = dict(categories=["Pizza"], state="FL", city="Tampa", closeness=20, direction="Top", numRows=100)
+
+# Writes a dataset of "numRows" locations, one JSON object per line (like the Yelp dataset), and returns its path.
+# The same size always gives the same file; an existing file is reused.
+def generateDataset(dataFolder, numRows):
+    path = os.path.join(dataFolder, "yelp_" + str(numRows) + ".json")
+    if os.path.exists(path):
+        return path
+    os.makedirs(dataFolder, exist_ok=True)
+    rng = random.Random(SEED + numRows)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        for i in range(numRows):
+            city, state, latitude, longitude = rng.choice(CITIES)
+            numCategories = rng.choice([0, 1, 2, 2, 3, 3, 4, 5, 6])
+            # Most locations have a few common categories, and some have rarer ones.
+            categories = [rng.choice(COMMON_CATEGORIES) if rng.random() < 0.8 else rng.choice(CATEGORIES) for _ in range(numCategories)]
+            record = {
+                "business_id": format(i, "022d"),
+                "name": "Business " + str(i),
+                "address": str(rng.randint(1, 9999)) + " Main St",
+                "city": city,
+                "state": state,
+                "postal_code": format(rng.randint(0, 99999), "05d"),
+                "latitude": latitude + rng.gauss(0, 0.15),
+                "longitude": longitude + rng.gauss(0, 0.15),
+                "stars": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0]),
+                "review_count": int(rng.paretovariate(1.2) * 5),
+                "is_open": rng.choice([0, 1]),
+                "attributes": None,
+                "categories": ", ".join(dict.fromkeys(categories)) if categories else None,
+                "hours": None,
+            }
+            file.write(json.dumps(record) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+# Runs "function" "repeats" times; returns (its last result, {"best": seconds, "median": seconds, "repeats": repeats}).
+def measure(function, repeats):
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, {"best": min(times), "median": statistics.median(times), "repeats": repeats}
+
+# Times every phase on one dataset. Returns {phase: timing}.
+def benchmarkSize(path, repeats, workers):
+    phases = {}
+
+    # Loading: the parse and merge phases are timed by "loadRecords" itself.
+    parseTimes, mergeTimes = [], []
+    for _ in range(repeats):
+        records, timings = loader.loadRecords(path, workers=workers)
+        parseTimes.append(timings["parse"])
+        mergeTimes.append(timings["merge"])
+    phases["load.parse"] = {"best": min(parseTimes), "median": statistics.median(parseTimes), "repeats": repeats}
+    phases["load.merge"] = {"best": min(mergeTimes), "median": statistics.median(mergeTimes), "repeats": repeats}
+    store, phases["load.construct"] = measure(lambda: LocationStore.fromRecords(records), repeats)
+
+    snapshotPath = snapshot.snapshotPathFor(path)
+    _, phases["load.snapshot"] = measure(lambda: snapshot.writeSnapshot(snapshotPath, path, store), repeats)
+    _, phases["load.reopen"] = measure(lambda: LocationStore.fromSnapshot(snapshot.openSnapshot(snapshotPath, path)), repeats)
+
+    indexes, phases["index.build"] = measure(lambda: LocationIndexes(store), repeats)
+
+    # Scoring and sorting, on the scores of a mid-range closeness factor.
+    _, phases["chompify"] = measure(lambda: store.chompify(FILTER_QUERY["closeness"]), repeats)
+    keys = store.chompability
+    for algorithm in sorted(sorting.ALGORITHMS):
+        try:
+            ranking, phases["sort." + algorithm] = measure(lambda: sorting.sortOrder(keys, algorithm), repeats)
+        except RecursionError:
+            # The original, recursive Quick Sort can run out of stack on large inputs; that is reported rather than hidden.
+            phases["sort." + algorithm] = {"error": "RecursionError"}
+    _, phases["select.topK"] = measure(lambda: sorting.selectOrder(keys, 100), repeats)
+
+    # Filtering: a fresh engine per run, so the scores cached by the last run are not reused.
+    query = Query(**FILTER_QUERY)
+    engine = QueryEngine(store, indexes)
+    _, phases["filter.match"] = measure(lambda: engine.match(query), repeats)
+    _, phases["filter.run"] = measure(lambda: QueryEngine(store, indexes).run(query), repeats)
+
+    os.remove(snapshotPath)
+    return phases
+
+# Returns the current commit (or None, outside of a git checkout).
+def currentCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=SRC, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Prints how every phase changed since an earlier run (the ratio of the best times), and returns the phases that got slower
+# by more than REGRESSION_RATIO.
+def compare(before, after):
+    regressions = []
+    for size, phases in after["results"].items():
+        print("n = " + size + ":")
+        for phase, timing in phases.items():
+            old = before["results"].get(size, {}).get(phase)
+            if old is None or "best" not in old or "best" not in timing:
+                continue
+            ratio = timing["best"] / old["best"] if old["best"] else float("inf")
+            flag = ""
+            if ratio > REGRESSION_RATIO:
+                flag = "  <-- REGRESSION"
+                regressions.append((size, phase, ratio))
+            print("  " + phase.ljust(20) + format(old["best"] * 1000, "10.2f") + " ms -> " + format(timing["best"] * 1000, "10.2f") + " ms  (" + format(ratio, ".2f") + "x)" + flag)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the load, score, sort and filter phases of Chomp! on synthetic datasets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, metavar="N", help="the dataset sizes (default: 1k, 10k, 150k and 1M)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="the number of processes used to parse the datasets (default: one per CPU)")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="the folder the generated datasets are kept in")
+    parser.add_argument("--output", default=None, help="the JSON file the results are written to (default: printed)")
+    parser.add_argument("--compare", default=None, metavar="JSON", help="the results of an earlier run to compare with (exits with 1 on a regression)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": currentCommit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": scoring.numpy is not None,
+        "repeats": args.repeats,
+        "results": {},
+    }
+    for size in args.sizes:
+        path = generateDataset(args.data, size)
+        print("Benchmarking " + str(size) + " locations...", file=sys.stderr)
+        results["results"][str(size)] = benchmarkSize(path, args.repeats, args.workers)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            before = json.load(file)
+        if compare(before, results):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
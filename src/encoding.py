@@ -0,0 +1,130 @@
+# DICTIONARY ENCODING
+# Reference: https://en.wikipedia.org/wiki/Dictionary_coder
+# The city, state and categories of the locations repeat a lot ("Restaurants" and "Philadelphia" appear tens of thousands of times),
+# so instead of keeping a separate string for every location, every distinct string is kept once in a table, and each location
+# only keeps its (4-byte) integer "code" in that table. Comparing two codes is an integer comparison, and the columns take a fraction of the memory.
+# The columns below read like lists of strings (column[row] returns the string, or the list of strings), so the rest of the app
+# does not need to know about the codes; those that do (the indexes, the snapshot) read "codes" directly.
+from array import array
+# "accumulate" turns the number of values of every row into the offsets where the rows start (https://docs.python.org/3/library/itertools.html#itertools.accumulate).
+from itertools import accumulate
+
+# CLASS: StringDictionary
+# The table of distinct strings: "table[code]" is a string, and "codeOf(string)" its code (a new string is given the next code).
+class StringDictionary:
+    def __init__(self, table=()):
+        self.table = list(table)
+        self.codes = {string: code for code, string in enumerate(self.table)}
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, code):
+        return self.table[code]
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def codeOf(self, string):
+        code = self.codes.get(string)
+        if code is None:
+            # The string is put in the table before its code is handed out, so a code is never read before its string exists.
+            code = len(self.table)
+            self.table.append(string)
+            self.codes[string] = code
+        return code
+
+# CLASS: EncodedColumn
+# A column with one string per row, kept as one code per row ("codes", an array of unsigned integers, or a view of a snapshot).
+# Called with "EncodedColumn.fromValues(strings)".
+class EncodedColumn:
+    def __init__(self, dictionary, codes):
+        self.dictionary = dictionary
+        self.codes = codes
+
+    @classmethod
+    def fromValues(cls, values):
+        dictionary = StringDictionary(dict.fromkeys(values))
+        return cls(dictionary, array("I", map(dictionary.codes.__getitem__, values)))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        return self.dictionary.table[self.codes[row]]
+
+    def __iter__(self):
+        table = self.dictionary.table
+        for code in self.codes:
+            yield table[code]
+
+    def __setitem__(self, row, value):
+        self.codes[row] = self.dictionary.codeOf(value)
+
+    def append(self, value):
+        self.codes.append(self.dictionary.codeOf(value))
+
+    # Copies the codes out of a snapshot (which is read-only), so rows can be changed and added.
+    def makeWritable(self):
+        if not isinstance(self.codes, array):
+            self.codes = array("I", self.codes)
+
+# CLASS: EncodedListColumn
+# A column with a list of strings per row (the categories), kept as one flat array of codes ("codes"):
+# the codes of row "i" are codes[starts[i]:ends[i]]. When a row is loaded, its codes come right after the codes of the row before
+# (so "starts" and "ends" are the same offsets, shifted by one); when a row is changed, its new codes are added at the end.
+# Called with "EncodedListColumn.fromLists(lists)".
+class EncodedListColumn:
+    def __init__(self, dictionary, codes, starts, ends):
+        self.dictionary = dictionary
+        self.codes = codes
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def fromLists(cls, lists):
+        dictionary = StringDictionary(dict.fromkeys(value for values in lists for value in values))
+        codes = dictionary.codes
+        offsets = array("I", accumulate(map(len, lists), initial=0))
+        return cls.fromOffsets(dictionary, array("I", [codes[value] for values in lists for value in values]), offsets)
+
+    # Builds a column from a flat array of codes and the offsets of every row (plus one more, marking the end of the last row).
+    # With a memoryview (of a snapshot), nothing is copied.
+    @classmethod
+    def fromOffsets(cls, dictionary, codes, offsets):
+        return cls(dictionary, codes, offsets[:-1], offsets[1:])
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, row):
+        table = self.dictionary.table
+        return [table[code] for code in self.codes[self.starts[row]:self.ends[row]]]
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    # Returns the codes of a row.
+    def codesOf(self, row):
+        return self.codes[self.starts[row]:self.ends[row]]
+
+    def __setitem__(self, row, values):
+        start = len(self.codes)
+        self.codes.extend([self.dictionary.codeOf(value) for value in values])
+        self.starts[row], self.ends[row] = start, len(self.codes)
+
+    # The end of the row is added last, so "len(column)" never counts a row whose codes are not all there yet.
+    def append(self, values):
+        start = len(self.codes)
+        self.codes.extend([self.dictionary.codeOf(value) for value in values])
+        self.starts.append(start)
+        self.ends.append(len(self.codes))
+
+    def makeWritable(self):
+        if not isinstance(self.codes, array):
+            self.codes = array("I", self.codes)
+        if not isinstance(self.starts, array):
+            self.starts = array("I", self.starts)
+        if not isinstance(self.ends, array):
+            self.ends = array("I", self.ends)
@@ -0,0 +1,76 @@
+# INVERTED INDEXES
+# Reference: https://en.wikipedia.org/wiki/Inverted_index
+# Instead of checking every location against the inputted categories, state and city, every category, state and city is mapped
+# (once, when the dataset is loaded) to the sorted row numbers of the locations that have it: its "posting list".
+# A filter is then answered by combining a few posting lists, and never looks at a location that does not match.
+from array import array
+# Python's native binary search (https://docs.python.org/3/library/bisect.html) finds where a row goes in a sorted posting list.
+from bisect import bisect_left
+from encoding import EncodedListColumn
+
+# Posting lists are kept as compact arrays of unsigned integers ("I" = 4 bytes per row).
+EMPTY_POSTINGS = array("I")
+
+# Builds {value: array of row numbers} from an encoded column (see "encoding.py"): an EncodedColumn with one value per row,
+# or an EncodedListColumn with a list of values per row. The rows are gathered by integer code, and only turned into strings at the end.
+# Rows are visited in order, so every posting list comes out sorted.
+def buildIndex(column):
+    rowsByCode = [[] for _ in range(len(column.dictionary))]
+    if isinstance(column, EncodedListColumn):
+        codes = column.codes
+        for row, (start, end) in enumerate(zip(column.starts, column.ends)):
+            for code in codes[start:end]:
+                rowsByCode[code].append(row)
+    else:
+        for row, code in enumerate(column.codes):
+            rowsByCode[code].append(row)
+    table = column.dictionary.table
+    return {table[code]: array("I", rows) for code, rows in enumerate(rowsByCode) if rows}
+
+# CLASS: LocationIndexes
+# The category, state and city indexes of a LocationStore. Called with "LocationIndexes(store)".
+class LocationIndexes:
+    def __init__(self, store):
+        self.categories = buildIndex(store.categories)
+        self.states = buildIndex(store.states)
+        self.cities = buildIndex(store.cities)
+
+    # UPDATES (see "ingest.py")
+    # Takes rows out of (or puts rows into) the posting lists of their current categories, state and city, so "removeRows" is called
+    # before the locations change, and "addRows" after. Only the posting lists of the values of those rows are touched.
+    # A posting list is never changed in place (a query on another thread may be reading it): it is copied, and the copy replaces it.
+    def removeRows(self, rows, store):
+        self._update(rows, store, _without)
+
+    def addRows(self, rows, store):
+        self._update(rows, store, _with)
+
+    def _update(self, rows, store, change):
+        for index, column, multiValued in ((self.categories, store.categories, True), (self.states, store.states, False), (self.cities, store.cities, False)):
+            rowsByValue = {}
+            for row in rows:
+                for value in (column[row] if multiValued else [column[row]]):
+                    rowsByValue.setdefault(value, []).append(row)
+            for value, valueRows in rowsByValue.items():
+                postings = change(index.get(value, EMPTY_POSTINGS), valueRows)
+                if postings:
+                    index[value] = postings
+                else:
+                    index.pop(value, None)
+
+# Returns a copy of a sorted posting list with some rows inserted (or removed), still sorted.
+def _with(postings, rows):
+    postings = array("I", postings)
+    for row in rows:
+        i = bisect_left(postings, row)
+        if i == len(postings) or postings[i] != row:
+            postings.insert(i, row)
+    return postings
+
+def _without(postings, rows):
+    postings = array("I", postings)
+    for row in rows:
+        i = bisect_left(postings, row)
+        if i < len(postings) and postings[i] == row:
+            del postings[i]
+    return postings
@@ -0,0 +1,102 @@
+# INCREMENTAL UPDATES
+# Applies a "delta" file of added, changed and removed locations to a loaded store, instead of reading the whole dataset again.
+# Only the rows of those locations are touched: their columns in the store (see "LocationStore.update"), their entries in the
+# category, state and city indexes (see "LocationIndexes.addRows"), and their places in any cached rankings (see "RankingCache.update"),
+# so applying an update takes time in proportion to its size rather than to the size of the dataset.
+#
+# DELTA FILE: one JSON object per line, like the dataset itself.
+    # A location whose "business_id" is not in the store yet is added.
+    # A location whose "business_id" is already in the store replaces it.
+    # {"business_id": "...", "deleted": true} removes a location.
+# If the same business appears more than once, its last line wins.
+# Run with "python ingest.py <delta file>" to check an update against the dataset (it is applied in memory, then reported).
+import argparse
+import json
+import sys
+import loader
+from indexes import LocationIndexes
+from locationstore import loadStore
+from instrumentation import metrics
+
+# CLASS: Delta
+# The contents of a delta file: "upserts" are records (see "loader.parseLocation") to add or replace, "removals" are business IDs.
+# Called with "Delta.read(path)" or "Delta.parse(lines)".
+class Delta:
+    def __init__(self, upserts=(), removals=()):
+        self.upserts = list(upserts)
+        self.removals = list(removals)
+
+    def __len__(self):
+        return len(self.upserts) + len(self.removals)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, encoding="utf-8") as deltaFile:
+            return cls.parse(deltaFile)
+
+    # Raises ValueError (with the line number) if a line is not a valid location.
+    @classmethod
+    def parse(cls, lines):
+        # business ID -> record, or None if it is removed (a later line for the same ID replaces an earlier one).
+        changes = {}
+        for lineNumber, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                locationJSON = json.loads(line)
+                if locationJSON.get("deleted"):
+                    changes[locationJSON["business_id"]] = None
+                else:
+                    record = loader.parseLocation(locationJSON)
+                    changes[record[0]] = record
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                raise ValueError("line " + str(lineNumber) + " of the update is not a valid location (" + type(error).__name__ + ": " + str(error) + ")") from None
+        return cls([record for record in changes.values() if record is not None], [ID for ID, record in changes.items() if record is None])
+
+# Applies a Delta to a store and its indexes, and (if given) to a RankingCache and a QueryEngine.
+# Returns (number added, number changed, number removed); removing a business that is not in the store does nothing.
+# Nothing else may update the store at the same time (queries may run on other threads while it is updated).
+def applyDelta(delta, store, indexes, rankings=None, engine=None):
+    with metrics.timer("ingest.apply"):
+        changed, added, removed = [], [], []
+        for record in delta.upserts:
+            row = store.rowOf(record[0])
+            if row is None:
+                added.append(record)
+            else:
+                changed.append((row, record))
+        for ID in delta.removals:
+            row = store.rowOf(ID)
+            if row is not None:
+                removed.append(row)
+
+        # The indexes are updated in two steps: the old values of the rows are taken out before the store changes, and the new ones put in after.
+        indexes.removeRows([row for row, record in changed] + removed, store)
+        before, newRows = store.update(changed, added, removed)
+        indexes.addRows(newRows, store)
+        if rankings is not None:
+            rankings.update(before, newRows)
+        if engine is not None:
+            engine.invalidate()
+
+    metrics.count("ingest.added", len(added))
+    metrics.count("ingest.changed", len(changed))
+    metrics.count("ingest.removed", len(removed))
+    return len(added), len(changed), len(removed)
+
+# COMMAND LINE
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an update (added, changed and removed locations) to the dataset, in memory.")
+    parser.add_argument("delta", help="the update file (one JSON object per line)")
+    parser.add_argument("--dataset", default=None, help="the path of the Yelp dataset file")
+    args = parser.parse_args(argv)
+
+    store, categories, states, cities = loadStore(args.dataset or loader.DATASET_PATH)
+    indexes = LocationIndexes(store)
+    delta = Delta.read(args.delta)
+    numAdded, numChanged, numRemoved = applyDelta(delta, store, indexes)
+    print("Added " + str(numAdded) + ", changed " + str(numChanged) + " and removed " + str(numRemoved) + " locations (" + metrics.summary(["ingest.apply"]) + ")")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# STREAMING, PARALLEL DATASET LOADER
+# Reads the Yelp business dataset (one JSON object per line) as a stream and parses it in chunks across a pool of processes,
+# so that the startup time of "chomp" scales with the number of CPU cores rather than with the number of lines in the file.
+# Python has a native library for running work in other processes (https://docs.python.org/3/library/concurrent.futures.html).
+from concurrent.futures import ProcessPoolExecutor
+# Python's native double-ended queue (https://docs.python.org/3/library/collections.html#collections.deque) holds the chunks in flight.
+from collections import deque
+# "islice" takes a fixed number of lines from the file without reading the rest of it (https://docs.python.org/3/library/itertools.html#itertools.islice).
+from itertools import islice
+import json
+import os
+import os.path
+import time
+
+# The default location of the dataset, relative to this file.
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset", "yelp_academic_dataset_business.json")
+
+# The number of lines handed to a worker process at once.
+# Larger chunks mean less inter-process communication, smaller chunks mean better load balancing.
+CHUNK_SIZE = 4096
+
+# Files smaller than this (in bytes) are parsed in the current process, since starting a pool costs more than it saves.
+PARALLEL_THRESHOLD = 4 * 1024 * 1024
+
+# RECORD PARSING
+# Turns one location of the dataset (a parsed JSON object) into a record: a tuple in the column order of "LocationStore".
+# Also used for the locations of an update file (see "ingest.py").
+def parseLocation(locationJSON):
+    if locationJSON["categories"] != None:
+        # The categories of a location are a single comma-separated string in the dataset.
+        category_list = locationJSON["categories"].split(", ")
+    else:
+        # If no categories exist for a given location, it is given the single category "None".
+        category_list = ["None"]
+    return (locationJSON["business_id"], locationJSON["name"], locationJSON["address"], locationJSON["city"], locationJSON["state"], locationJSON["latitude"], locationJSON["longitude"], locationJSON["stars"], locationJSON["review_count"], category_list)
+
+# CHUNK PARSING
+# Runs inside a worker process. "chunk" is a single string holding CHUNK_SIZE lines of the dataset
+# (one string is much cheaper to send between processes than a list of thousands of small strings).
+# Returns the records (list of tuples, in file order, in the column order of "LocationStore").
+# The sets of categories, states and cities are not built here: they are the tables of the store's encoded columns (see "encoding.py").
+def parseChunk(chunk):
+    records = []
+    for line in chunk.splitlines():
+        # Blank lines (for example, a trailing newline at the end of the file) are skipped.
+        if not line.strip():
+            continue
+        records.append(parseLocation(json.loads(line)))
+    return records
+
+# Yields the dataset file CHUNK_SIZE lines at a time, so the whole file is never held in memory at once.
+def readChunks(datasetFile, chunkSize):
+    while True:
+        lines = list(islice(datasetFile, chunkSize))
+        if not lines:
+            return
+        yield "".join(lines)
+
+# LOADING
+# Called with "loadRecords(DATASET_PATH)".
+# "workers" is the number of processes to parse with (None means one per CPU core, 1 means parse in this process).
+# Returns a tuple of (records, timings), where "timings" maps the name of each phase to its duration in seconds.
+# NOTE: on Windows and macOS, worker processes re-import the script that started them,
+# so the calling script must keep its top-level code behind an 'if __name__ == "__main__":' check.
+def loadRecords(datasetPath=DATASET_PATH, workers=None, chunkSize=CHUNK_SIZE):
+    timings = {}
+    records = []
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+        if os.path.getsize(datasetPath) < PARALLEL_THRESHOLD:
+            workers = 1
+
+    # Encoding issues are handled by adding "errors="replace"" into open(), as in the original loader.
+    start = time.perf_counter()
+    with open(datasetPath, errors="replace") as datasetFile:
+        chunks = readChunks(datasetFile, chunkSize)
+        if workers <= 1:
+            results = map(parseChunk, chunks)
+            mergeTime = _mergeResults(results, records)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                mergeTime = _mergeResults(_parallelMap(pool, chunks, workers * 2), records)
+    timings["parse"] = time.perf_counter() - start - mergeTime
+    timings["merge"] = mergeTime
+
+    return records, timings
+
+# Submits chunks to the pool while keeping at most "window" of them in flight,
+# and yields the results in file order (so the locations keep the same order as the file).
+def _parallelMap(pool, chunks, window):
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(parseChunk, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Appends every chunk's records onto the list of all records, returning the time spent doing so.
+def _mergeResults(results, records):
+    mergeTime = 0.0
+    for chunkRecords in results:
+        start = time.perf_counter()
+        records.extend(chunkRecords)
+        mergeTime += time.perf_counter() - start
+    return mergeTime
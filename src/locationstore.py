@@ -0,0 +1,336 @@
+# LOCATION STORE
+# Holds every location of the Yelp dataset as a "struct of arrays": instead of one Python object per location (each with its own
+# dictionary of ten attributes), every attribute is kept in one column, and location "i" is row "i" of every column.
+# Numeric columns are typed arrays (https://docs.python.org/3/library/array.html), which store raw 8-byte doubles or 4-byte integers
+# instead of full Python objects, so the store takes several times less memory than a list of objects.
+# Python has a native library for mathematical operations (https://docs.python.org/3/library/math.html); here, it is necessary to calculuate the
+# distance between two latitude/longitude pairs.
+import math
+import threading
+import time
+from array import array
+# Python's native ordered dictionary (https://docs.python.org/3/library/collections.html#collections.OrderedDict) remembers
+# the order in which the distance columns were used, so the least recently used one is always first.
+from collections import OrderedDict
+# The dataset used for this project is held within a ".json" file, which is read and parsed by "loader.py".
+import loader
+# Parsed locations are cached between launches in a binary snapshot file, which is read by "snapshot.py".
+import snapshot
+# Cities, states and categories are kept as integer codes into tables of distinct strings (see "encoding.py").
+from encoding import EncodedColumn, EncodedListColumn, StringDictionary
+# "Chompability" is calculated for the whole store at once by "scoring.py".
+import scoring
+# The time of every loading phase is also kept with the app's other metrics (see "instrumentation.py").
+from instrumentation import metrics
+
+# DISTANCE CALCULATION:
+# The latitude and longitude coordinate pair of the University of Florida, extracted from Google Maps:
+# https://www.google.com/maps/place/University+of+Florida/@29.6436325,-82.3636849,15z/data=!4m8!1m2!3m1!2sUniversity+of+Florida!3m4!1s0x88e8a30cfbe49275:0x206fe0de143d9886!8m2!3d29.6436325!4d-82.3549302
+UF_latitude = 29.6436325
+UF_longitude = -82.3636849
+# Distances are measured from an "origin", which is UF unless another one is chosen (see "LocationStore.setOrigin").
+UF_ORIGIN = (UF_latitude, UF_longitude)
+# The number of origins whose distance columns are kept, so switching between a few of them does not calculate them again.
+MAX_ORIGINS = 8
+# The Haversine formula (https://en.wikipedia.org/wiki/Haversine_formula)
+# is used to calculate the distance between two coordinates in "WGS-84" format.
+# https://stackoverflow.com/questions/27928/calculate-distance-between-two-latitude-longitude-points-haversine-formula
+
+def distance(latitude_1, longitude_1, latitude_2, longitude_2):
+    p = math.pi / 180 # PI / 180 is to convert degrees to radians.
+    a = 0.5 - (math.cos((latitude_2 - latitude_1) * p) / 2) + (math.cos(latitude_1 * p)) * (math.cos(latitude_2 * p)) * ((1 - math.cos((longitude_2 - longitude_1) * p)) / 2)
+    return math.ceil(12742 * math.asin(math.sqrt(a))) # Returns distance between two coordinate pairs in KILOMETERS, rounded up to nearest integer (ceiling). (note that 12742 = diameter of the Earth in km.)
+# usage: var = distance(store.latitude[i], store.longitude[i], UF_latitude, UF_longitude)
+
+# Returns a property that reads row "self.row" of the given column of the store.
+def _column(columnName):
+    return property(lambda self: getattr(self.store, columnName)[self.row])
+
+# CLASS: LocationView
+# A light "view" of one row of a LocationStore. It holds nothing but the store and the row number (thanks to "__slots__", it has no
+# dictionary either: https://docs.python.org/3/reference/datamodel.html#slots), and reads every attribute from the store's columns,
+# so it can be used anywhere a location object was used before:
+    # business ID (string),
+    # name (string),
+    # address (string),
+    # city (string),
+    # state (string),
+    # latitude (float),
+    # longitude (float),
+    # stars (float),
+    # review count (int),
+    # categories (list of strings),
+    # distance to UF (int),
+    # "Chompability" (float)
+class LocationView:
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    ID = _column("ids")
+    name = _column("names")
+    address = _column("addresses")
+    city = _column("cities")
+    state = _column("states")
+    latitude = _column("latitude")
+    longitude = _column("longitude")
+    stars = _column("stars")
+    numReviews = _column("numReviews")
+    categories = _column("categories")
+    distanceToUF = _column("distanceToUF")
+    numFactor = _column("numFactor")
+    chompability = _column("chompability")
+
+# CLASS: LocationStore
+# Every column has one entry per location, in dataset order:
+    # ids, names, addresses (sequences of strings),
+    # cities, states (EncodedColumns: sequences of strings, kept as codes into a table of distinct strings),
+    # categories (an EncodedListColumn: a sequence of lists of strings, kept as one flat array of codes),
+    # latitude, longitude, stars (arrays of doubles),
+    # numReviews (array of integers),
+    # distanceToUF (array of integers; the distance to the current origin, which is UF unless "setOrigin" is called),
+    # numFactor (array of doubles; numReviews / (5.0 / stars)),
+    # chompability (array of doubles; see "chompify").
+# Locations can be added, changed and removed afterwards with "update" (see "ingest.py"). A removed location keeps its row
+# (so no other row number changes), but its row is put in "deleted", and is left out of every index and ranking.
+class LocationStore:
+    def __init__(self, ids, names, addresses, cities, states, latitude, longitude, stars, numReviews, categories, distanceToUF=None, numFactor=None):
+        self.ids = ids
+        self.names = names
+        self.addresses = addresses
+        self.cities = cities
+        self.states = states
+        self.latitude = latitude
+        self.longitude = longitude
+        self.stars = stars
+        self.numReviews = numReviews
+        self.categories = categories
+
+        # Calculating the distance to UF of every location, unless it is already known (for example, when loading from a snapshot).
+        if distanceToUF is None:
+            distanceToUF = scoring.distances(latitude, longitude, UF_latitude, UF_longitude, array("i", bytes(4 * len(ids))))
+        self.origin = UF_ORIGIN
+        self.distanceToUF = distanceToUF
+        # origin -> distance column, for the most recently used origins.
+        self.distanceColumns = OrderedDict([(UF_ORIGIN, distanceToUF)])
+        self.distanceLock = threading.Lock()
+        # Increased by every "update", so a distance column calculated during one is not kept.
+        self.version = 0
+        if numFactor is None:
+            numFactor = scoring.numFactors(numReviews, stars)
+        self.numFactor = numFactor
+
+        # Calculating "Chompability" with the default closeness factor of 1.
+        self.chompability = array("d", bytes(8 * len(ids)))
+        self.chompify(1)
+
+        # The rows of the removed locations, and business ID -> row (only built once an update needs it).
+        self.deleted = set()
+        self.rowIds = None
+
+    # Builds a store from the records returned by "loader.loadRecords" (the cities, states and categories are encoded here).
+    @classmethod
+    def fromRecords(cls, records):
+        if not records:
+            return cls([], [], [], EncodedColumn.fromValues([]), EncodedColumn.fromValues([]), array("d"), array("d"), array("d"), array("i"), EncodedListColumn.fromLists([]))
+        ids, names, addresses, cities, states, latitude, longitude, stars, numReviews, categories = zip(*records)
+        return cls(list(ids), list(names), list(addresses), EncodedColumn.fromValues(cities), EncodedColumn.fromValues(states),
+                   array("d", latitude), array("d", longitude), array("d", stars), array("i", numReviews), EncodedListColumn.fromLists(categories))
+
+    # Builds a store straight on top of an opened snapshot. Every column is used as it is (nothing is copied out of the mapped file):
+    # the cities, states and categories are stored there with the same codes and tables as in the store.
+    @classmethod
+    def fromSnapshot(cls, cached):
+        cities = EncodedColumn(StringDictionary(cached.cityTable), cached.cityCodes)
+        states = EncodedColumn(StringDictionary(cached.stateTable), cached.stateCodes)
+        categories = EncodedListColumn.fromOffsets(StringDictionary(cached.categoryTable), cached.rowCategoryCodes, cached.rowCategoryOffsets)
+        return cls(cached.ids, cached.names, cached.addresses, cities, states, cached.latitude, cached.longitude, cached.stars, cached.numReviews, categories, cached.distanceToUF, cached.numFactor)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, row):
+        return LocationView(self, row)
+
+    def __iter__(self):
+        for row in self.liveRows():
+            yield LocationView(self, row)
+
+    # Returns a new list with a view of every location, in dataset order (this is the list that the sorting algorithms rearrange).
+    def rows(self):
+        return [LocationView(self, row) for row in self.liveRows()]
+
+    # Returns the rows of every location that has not been removed.
+    def liveRows(self):
+        if not self.deleted:
+            return range(len(self))
+        deleted = self.deleted
+        return [row for row in range(len(self)) if row not in deleted]
+
+    # Returns the row of a business ID, or None if it is not in the store.
+    def rowOf(self, businessId):
+        if self.rowIds is None:
+            deleted = self.deleted
+            self.rowIds = {ID: row for row, ID in enumerate(self.ids) if row not in deleted}
+        return self.rowIds.get(businessId)
+
+    # Returns the distance column (in kilometers) from every location to an origin (a (latitude, longitude) pair).
+    # Columns are cached for the MAX_ORIGINS most recently used origins; the current origin's column is never dropped.
+    def distancesFrom(self, origin):
+        origin = (float(origin[0]), float(origin[1]))
+        with self.distanceLock:
+            column = self.distanceColumns.get(origin)
+            if column is not None:
+                self.distanceColumns.move_to_end(origin)
+                return column
+        while True:
+            version = self.version
+            column = scoring.distances(self.latitude, self.longitude, origin[0], origin[1], array("i", bytes(4 * len(self))))
+            with self.distanceLock:
+                # If the locations were updated while the column was being calculated, it is calculated again.
+                if version != self.version:
+                    continue
+                self.distanceColumns[origin] = column
+                for oldOrigin in list(self.distanceColumns):
+                    if len(self.distanceColumns) <= MAX_ORIGINS:
+                        break
+                    if oldOrigin != self.origin:
+                        del self.distanceColumns[oldOrigin]
+                return column
+
+    # Measures distances from another origin (a latitude/longitude pair) from now on: "distanceToUF" becomes the distance to it.
+    # Since chompability depends on the distance, "chompability" is calculated again (with the last closeness factor) if the origin changed.
+    def setOrigin(self, latitude, longitude):
+        origin = (float(latitude), float(longitude))
+        if origin == self.origin:
+            return
+        self.distanceToUF = self.distancesFrom(origin)
+        self.origin = origin
+        self.chompify(self.closenessFactor)
+
+    # "chompify" calculates the "Chompability" of every location based on a closeness factor:
+    # chompability = (X / distance) + (numReviews / stars)
+    # where X is a *USER-INPUTTED* "closeness factor" (default is 1);
+    # if it is increased, then the user is okay with traveling a larger distance
+    # and as a result, the chompability of restaurants that are further away from UF will increase.
+    # The whole column is calculated in one batch (see "scoring.py").
+    def chompify(self, closenessFactor):
+        scoring.chompify(self.distanceToUF, self.numFactor, closenessFactor, self.chompability)
+        self.closenessFactor = closenessFactor
+
+    # UPDATES
+    # Applies changed, added and removed locations (called by "ingest.applyDelta", which also updates the indexes and rankings):
+    # "changed" is a list of (row, record) pairs, "added" a list of records and "removed" a list of rows,
+    # where a record is a tuple in the order of the columns (see "loader.parseLocation").
+    # Only the given rows are calculated again (their numFactor, chompability, and distance from every cached origin).
+    # Returns (before, newRows): {row: (numFactor, {origin: distance})} with the old values of every changed and removed row,
+    # and the rows of the changed and added locations.
+    def update(self, changed, added, removed):
+        with self.distanceLock:
+            self.version += 1
+            self._makeWritable()
+            before = {}
+            for row in [row for row, record in changed] + list(removed):
+                before[row] = (self.numFactor[row], {origin: column[row] for origin, column in self.distanceColumns.items()})
+
+            for row, record in changed:
+                self._setRow(row, record)
+            newRows = [row for row, record in changed]
+            for record in added:
+                newRows.append(self._appendRow(record))
+            for row in removed:
+                self.deleted.add(row)
+                del self.rowIds[self.ids[row]]
+        return before, newRows
+
+    # Turns the columns that are backed by a snapshot (read-only views of the mapped file) into arrays and lists that can be changed.
+    # This copies every column once, on the first update only.
+    def _makeWritable(self):
+        for name in ("ids", "names", "addresses"):
+            if not isinstance(getattr(self, name), list):
+                setattr(self, name, list(getattr(self, name)))
+        for column in (self.cities, self.states, self.categories):
+            column.makeWritable()
+        for name, typecode in (("latitude", "d"), ("longitude", "d"), ("stars", "d"), ("numReviews", "i"), ("numFactor", "d")):
+            if not isinstance(getattr(self, name), array):
+                setattr(self, name, array(typecode, getattr(self, name)))
+        for origin, column in self.distanceColumns.items():
+            if not isinstance(column, array):
+                self.distanceColumns[origin] = array("i", column)
+        self.distanceToUF = self.distanceColumns[self.origin]
+        if self.rowIds is None:
+            self.rowOf(None)
+
+    def _setRow(self, row, record):
+        ID, name, address, city, state, latitude, longitude, stars, numReviews, categories = record
+        self.names[row], self.addresses[row], self.cities[row], self.states[row] = name, address, city, state
+        self.latitude[row], self.longitude[row], self.stars[row], self.numReviews[row] = latitude, longitude, stars, numReviews
+        self.categories[row] = categories
+        self.numFactor[row] = scoring.numFactorOf(numReviews, stars)
+        for origin, column in self.distanceColumns.items():
+            column[row] = distance(latitude, longitude, origin[0], origin[1])
+        self.chompability[row] = scoring.chompabilityOf(self.distanceToUF[row], self.numFactor[row], self.closenessFactor)
+
+    # The business ID is appended last: until then, "len(store)" does not count the new row, so a query running
+    # on another thread never reads a row that is only in some of the columns.
+    def _appendRow(self, record):
+        ID, name, address, city, state, latitude, longitude, stars, numReviews, categories = record
+        row = len(self.ids)
+        self.names.append(name)
+        self.addresses.append(address)
+        self.cities.append(city)
+        self.states.append(state)
+        self.latitude.append(latitude)
+        self.longitude.append(longitude)
+        self.stars.append(stars)
+        self.numReviews.append(numReviews)
+        self.categories.append(categories)
+        self.numFactor.append(scoring.numFactorOf(numReviews, stars))
+        for origin, column in self.distanceColumns.items():
+            column.append(distance(latitude, longitude, origin[0], origin[1]))
+        self.chompability.append(scoring.chompabilityOf(self.distanceToUF[row], self.numFactor[row], self.closenessFactor))
+        self.ids.append(ID)
+        self.rowIds[ID] = row
+        return row
+
+# READING THE .json FILE (and creating a LocationStore with it).
+# Sets of Categories, States, and Cities are also returned (why sets? no duplicates!); they are the tables of distinct strings of the store.
+# They will be used for dropdown menus & checking input validity in the GUI.
+# Note that the number of categories is very large (1300+): https://blog.yelp.com/businesses/yelp_category_list/
+# If a snapshot of a previous launch exists and still matches the .json file, the store is built on top of it (see "snapshot.py").
+# Otherwise, the file is read as a stream and parsed in chunks across a pool of processes (see "loader.py"), and a new snapshot is written.
+# Called with "loadStore(loader.DATASET_PATH)"; returns a tuple of (store, categories, states, cities).
+def loadStore(datasetPath):
+    snapshotPath = snapshot.snapshotPathFor(datasetPath)
+
+    start = time.perf_counter()
+    cached = snapshot.openSnapshot(snapshotPath, datasetPath)
+    if cached is not None:
+        timings = {"map": time.perf_counter() - start}
+
+        start = time.perf_counter()
+        store = LocationStore.fromSnapshot(cached)
+        timings["construct"] = time.perf_counter() - start
+    else:
+        records, timings = loader.loadRecords(datasetPath)
+
+        start = time.perf_counter()
+        store = LocationStore.fromRecords(records)
+        timings["construct"] = time.perf_counter() - start
+
+        # Saving a snapshot for the next launch. If it cannot be written (e.g. the folder is read-only), the app carries on without it.
+        start = time.perf_counter()
+        try:
+            snapshot.writeSnapshot(snapshotPath, datasetPath, store)
+        except OSError as error:
+            print("Could not write the snapshot cache: " + str(error))
+        timings["snapshot"] = time.perf_counter() - start
+
+    # Reporting how long each phase of loading took.
+    for phase, seconds in timings.items():
+        metrics.record("load." + phase, seconds)
+    categories, states, cities = set(store.categories.dictionary), set(store.states.dictionary), set(store.cities.dictionary)
+    print("Loaded " + str(len(store)) + " locations (" + ", ".join(phase + ": " + format(seconds, ".3f") + "s" for phase, seconds in timings.items()) + ")")
+    return store, categories, states, cities
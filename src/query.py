@@ -0,0 +1,214 @@
+# QUERY ENGINE
+# Answers a query such as "the top 10 Pizza places in Gainesville, FL, with a closeness factor of 20" without sorting the whole dataset.
+# A query is planned in three steps:
+#   1. Every field that was given (categories, state, city) is looked up in the inverted indexes (see "indexes.py"),
+#      and a radius around a point ("near"), or the locations nearest to a point ("nearest"), in the spatial index (see "spatial.py").
+#      Within the categories field, a location matches if it has ANY of the categories; across fields, a location must match
+#      ALL of them (or, with "matchAll=False", ANY of them, which is how the GUI used to filter).
+#   2. For "match all", the most selective field (the one with the fewest rows) is taken first, and the other fields only
+#      check its rows, with a binary search in their sorted posting lists; so the work depends on the smallest field, not on the dataset.
+#   3. Only the matching rows are scored, and only the top (or bottom) N of them are kept in a heap (a partial sort).
+# The same engine is used by the GUI ("chomp.py"), by scripts (QueryEngine.run), and from the command line:
+#   python query.py --category Pizza --state FL --city Gainesville --closeness 20 --top 10
+import argparse
+# Python's native binary search (https://docs.python.org/3/library/bisect.html) checks whether a row is in a sorted posting list.
+from bisect import bisect_left
+import heapq
+import sys
+import threading
+from array import array
+from indexes import EMPTY_POSTINGS, LocationIndexes
+from locationstore import loadStore
+from spatial import SpatialIndex
+from instrumentation import metrics
+from loader import DATASET_PATH
+import scoring
+
+# Matching rows are scored one at a time when there are fewer than 1 / SCORE_ALL_RATIO of the store's rows;
+# otherwise the whole column is scored in one batch (see "scoring.py"), which is faster per row.
+SCORE_ALL_RATIO = 8
+
+# CLASS: Query
+# The inputs of one query. "categories" is a list of category names; an empty or "None" category or city, and the "Any" state,
+# mean "no filter" (as in the GUI). "direction" is "Top" (highest chompability first) or "Bottom" (lowest first).
+# "near" is either None or (latitude, longitude, radius in kilometers), to only include the locations within that radius.
+# "nearest" is either None or (latitude, longitude, k), to only include the k locations nearest to that point.
+# "origin" is the (latitude, longitude) pair that distances are measured from for chompability (None for the store's current origin).
+class Query:
+    def __init__(self, categories=(), state="Any", city='', closeness=1, direction="Top", numRows=10, matchAll=True, near=None, origin=None, nearest=None):
+        self.categories = [category for category in categories if category != '' and category != "None"]
+        self.state = state
+        self.city = city
+        self.closeness = closeness
+        self.direction = direction
+        self.numRows = numRows
+        self.matchAll = matchAll
+        self.near = near
+        self.origin = origin
+        self.nearest = nearest
+
+# Returns True if "row" is in the sorted posting list.
+def _contains(postings, row):
+    i = bisect_left(postings, row)
+    return i < len(postings) and postings[i] == row
+
+# CLASS: QueryEngine
+# Called with "QueryEngine(store)" (the indexes are built if they are not given).
+class QueryEngine:
+    def __init__(self, store, indexes=None):
+        self.store = store
+        self.indexes = indexes if indexes is not None else LocationIndexes(store)
+        # The spatial index takes a while to build, so it is only built for the first query that needs it.
+        self.spatialIndex = None
+        self.spatialLock = threading.Lock()
+        # The last (origin, closeness factor) scored in one batch, and its scores (so repeated queries do not score the whole store again).
+        # Both are kept in one tuple, so a thread never sees the key of one batch with the scores of another.
+        self.scored = (None, None)
+
+    # Returns the fields of a query as (name, posting lists) pairs, from the most to the least selective.
+    # A location matches a field if it is in any of its posting lists (a field has several only for several categories).
+    def plan(self, query):
+        fields = []
+        if query.categories:
+            fields.append(("categories", [self.indexes.categories.get(category, EMPTY_POSTINGS) for category in query.categories]))
+        if query.state != "Any":
+            fields.append(("state", [self.indexes.states.get(query.state, EMPTY_POSTINGS)]))
+        if query.city != '' and query.city != "None":
+            fields.append(("city", [self.indexes.cities.get(query.city, EMPTY_POSTINGS)]))
+        if query.near is not None:
+            rows = self.spatial().rowsWithin(*query.near)
+            # The spatial index is only rebuilt when it is next needed (see "invalidate"), so it may still have removed locations.
+            if self.store.deleted:
+                rows = array("I", [row for row in rows if row not in self.store.deleted])
+            fields.append(("near", [rows]))
+        if query.nearest is not None:
+            fields.append(("nearest", [array("I", sorted(row for row, kilometers in self.nearest(*query.nearest)))]))
+        fields.sort(key=lambda field: sum(len(postings) for postings in field[1]))
+        return fields
+
+    # Returns the sorted rows of the locations matching a query, or None if the query has no filter (every location matches).
+    def match(self, query):
+        fields = self.plan(query)
+        if not fields:
+            return None
+        if not query.matchAll:
+            rows = _union([postings for name, field in fields for postings in field])
+            metrics.count("filter.rowsScanned", sum(len(postings) for name, field in fields for postings in field))
+            metrics.count("filter.rowsMatched", len(rows))
+            return rows
+
+        # The rows of the most selective field are the only candidates; each other field can only remove some of them.
+        rows = _union(fields[0][1])
+        metrics.count("filter.rowsScanned", sum(len(postings) for postings in fields[0][1]))
+        for name, field in fields[1:]:
+            if not rows:
+                break
+            metrics.count("filter.rowsScanned", len(rows))
+            if len(field) == 1:
+                postings = field[0]
+                rows = array("I", [row for row in rows if _contains(postings, row)])
+            else:
+                rows = array("I", [row for row in rows if any(_contains(postings, row) for postings in field)])
+        metrics.count("filter.rowsMatched", len(rows))
+        return rows
+
+    # Returns the spatial index of the store (see "spatial.py"), building it the first time.
+    def spatial(self):
+        with self.spatialLock:
+            if self.spatialIndex is None:
+                self.spatialIndex = SpatialIndex.fromStore(self.store)
+            return self.spatialIndex
+
+    # Returns the k locations nearest to a latitude/longitude pair, as a list of (row, kilometers), from the nearest.
+    def nearest(self, latitude, longitude, k):
+        deleted = self.store.deleted
+        if not deleted:
+            return self.spatial().nearest(latitude, longitude, k)
+        # The spatial index may still have removed locations (see "plan"), so enough extra ones are asked for to skip them.
+        found = self.spatial().nearest(latitude, longitude, k + len(deleted))
+        return [(row, kilometers) for row, kilometers in found if row not in deleted][:k]
+
+    # Forgets the scores and the spatial index built from the locations as they were (called after they are updated, see "ingest.py").
+    # The indexes are updated separately, row by row.
+    def invalidate(self):
+        self.scored = (None, None)
+        with self.spatialLock:
+            self.spatialIndex = None
+
+    # Runs a query. Returns (rows, scores): the rows of (at most) numRows matching locations, from first to last place,
+    # and their chompability.
+    def run(self, query):
+        with metrics.timer("query.match"):
+            rows = self.match(query)
+        if rows is None:
+            rows = self.store.liveRows()
+
+        with metrics.timer("query.select"):
+            origin = query.origin if query.origin is not None else self.store.origin
+            score = self._scorer(origin, query.closeness, len(rows))
+            if query.direction == "Top":
+                selected = heapq.nlargest(query.numRows, rows, key=score)
+            else:
+                selected = heapq.nsmallest(query.numRows, rows, key=score)
+            return selected, [score(row) for row in selected]
+
+    # Returns a function giving the chompability of a row for an origin and closeness factor,
+    # scoring either the whole column at once or every row on its own (see SCORE_ALL_RATIO).
+    def _scorer(self, origin, closenessFactor, numRows):
+        key = (origin, closenessFactor)
+        scoredKey, scores = self.scored
+        if scoredKey == key and len(scores) == len(self.store):
+            return scores.__getitem__
+        distanceToUF = self.store.distancesFrom(origin)
+        if numRows * SCORE_ALL_RATIO < len(self.store):
+            return scoring.rowScorer(distanceToUF, self.store.numFactor, closenessFactor)
+        scores = scoring.chompify(distanceToUF, self.store.numFactor, closenessFactor, array("d", bytes(8 * len(self.store))))
+        self.scored = (key, scores)
+        return scores.__getitem__
+
+# Returns the sorted union (without duplicates) of some sorted posting lists.
+def _union(postingLists):
+    if len(postingLists) == 1:
+        return postingLists[0]
+    matching = set()
+    for postings in postingLists:
+        matching.update(postings)
+    return array("I", sorted(matching))
+
+# COMMAND LINE
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the most (or least) \"chompable\" locations.")
+    parser.add_argument("--category", action="append", default=[], help="a category to include (can be given several times)")
+    parser.add_argument("--state", default="Any")
+    parser.add_argument("--city", default='')
+    parser.add_argument("--closeness", type=int, default=1, choices=range(1, 101), metavar="1-100")
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument("--top", type=int, metavar="N", help="show the N locations with the highest chompability (the default, with N = 10)")
+    order.add_argument("--bottom", type=int, metavar="N", help="show the N locations with the lowest chompability")
+    parser.add_argument("--near", type=float, nargs=2, metavar=("LATITUDE", "LONGITUDE"), help="only include locations near this point")
+    parser.add_argument("--radius", type=float, default=10.0, metavar="KM", help="how near, with --near, in kilometers (default: 10)")
+    parser.add_argument("--nearest", type=float, nargs=2, metavar=("LATITUDE", "LONGITUDE"), help="only include the locations nearest to this point")
+    parser.add_argument("--count", type=int, default=10, metavar="K", help="how many, with --nearest (default: 10)")
+    parser.add_argument("--origin", type=float, nargs=2, metavar=("LATITUDE", "LONGITUDE"), help="measure distances from this point instead of UF")
+    parser.add_argument("--any", action="store_true", help="include locations matching ANY of the filters, instead of ALL of them")
+    parser.add_argument("--dataset", default=None, help="the path of the Yelp dataset file")
+    args = parser.parse_args(argv)
+
+    store, categories, states, cities = loadStore(args.dataset or DATASET_PATH)
+    if args.origin:
+        store.setOrigin(*args.origin)
+
+    if args.bottom is not None:
+        direction, numRows = "Bottom", args.bottom
+    else:
+        direction, numRows = "Top", args.top if args.top is not None else 10
+    query = Query(args.category, args.state, args.city, args.closeness, direction, numRows, matchAll=not args.any, near=(args.near[0], args.near[1], args.radius) if args.near else None,
+                  nearest=(args.nearest[0], args.nearest[1], args.count) if args.nearest else None)
+    rows, scores = QueryEngine(store).run(query)
+    for place, (row, score) in enumerate(zip(rows, scores), 1):
+        location = store[row]
+        print("\t".join([str(place), str(score), location.name, location.address, location.city, location.state, str(location.distanceToUF)]))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# RANKING CACHE
+# The "Closeness" scale only takes the integer values 1 to 100, and the sort type only has a few options, so the same rankings are
+# requested again and again (for example, when the user presses Chomp! twice, or moves the slider back and forth).
+# Every ranking (for an origin, closeness factor and sort type) is computed once and kept as a compact array of row numbers (4 bytes per location), sorted from the LOWEST
+# to the HIGHEST chompability. The least recently used rankings are dropped once the cache grows past its memory cap.
+# Optionally, the rankings of nearby closeness factors are computed ahead of time on a background thread ("warming").
+# When some locations change (see "ingest.py"), only those rows are moved in the cached rankings ("update"), instead of sorting again.
+from array import array
+# Python's native ordered dictionary (https://docs.python.org/3/library/collections.html#collections.OrderedDict) remembers
+# the order in which rankings were used, so the least recently used one is always first.
+from collections import OrderedDict
+# Python has a native library for running work on other threads (https://docs.python.org/3/library/threading.html).
+import threading
+import scoring
+import sorting
+
+# The default memory cap: 64 MB holds about 100 rankings of the full dataset.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# An update of more than 1 / RERANK_RATIO of the rows drops the cached rankings instead (sorting again is faster than moving that many rows).
+RERANK_RATIO = 16
+
+# CLASS: RankingCache
+# Called with "RankingCache(store)"; "maxBytes" is the memory cap, and "warmRadius" is how many closeness factors on either side
+# of a requested one are ranked in the background (0 turns warming off).
+class RankingCache:
+    def __init__(self, store, maxBytes=DEFAULT_MAX_BYTES, warmRadius=0):
+        self.store = store
+        self.maxBytes = maxBytes
+        self.warmRadius = warmRadius
+
+        # (origin, closenessFactor, algorithm) -> array of row numbers (and, once asked for, the position of every row in it).
+        self.rankings = OrderedDict()
+        self.positionCache = {}
+        self.bytesUsed = 0
+        self.hits = 0
+        self.misses = 0
+
+        # Rankings that are being computed right now, so the same one is never computed twice at the same time.
+        self.inProgress = {}
+        self.lock = threading.Lock()
+        # Increased by every update, so a ranking computed from the locations as they were before it is not kept.
+        self.generation = 0
+
+        # Keys waiting to be warmed, and the background thread that warms them (started the first time it is needed).
+        self.warmQueue = []
+        self.warmCondition = threading.Condition(self.lock)
+        self.warmThread = None
+
+    # Returns the ranking of every location for a closeness factor and sorting algorithm (measuring distances from "origin",
+    # or from the store's current origin), as an array of row numbers from the LOWEST to the HIGHEST chompability.
+    # The returned array must not be modified.
+    def rank(self, closenessFactor, algorithm, origin=None):
+        if origin is None:
+            origin = self.store.origin
+        key = (origin, closenessFactor, algorithm)
+        with self.lock:
+            ranking = self._lookup(key)
+            if ranking is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if ranking is None:
+            ranking = self._compute(key)
+        if self.warmRadius:
+            self.warm(closenessFactor, algorithm, origin)
+        return ranking
+
+    # Queues the closeness factors around "closenessFactor" to be ranked on the background thread.
+    # Only the most recent request is kept, since an older one is about a slider position the user has already left.
+    def warm(self, closenessFactor, algorithm, origin=None):
+        if origin is None:
+            origin = self.store.origin
+        keys = []
+        for offset in range(1, self.warmRadius + 1):
+            for neighbour in (closenessFactor + offset, closenessFactor - offset):
+                if 1 <= neighbour <= 100:
+                    keys.append((origin, neighbour, algorithm))
+        with self.lock:
+            self.warmQueue = [key for key in keys if key not in self.rankings]
+            if self.warmThread is None:
+                self.warmThread = threading.Thread(target=self._warmLoop, name="RankingCacheWarmer", daemon=True)
+                self.warmThread.start()
+            self.warmCondition.notify()
+
+    # Returns the position of every row in a ranking (positions[row] == i when ranking[i] == row),
+    # so that rows picked out by a filter can be put in ranked order without walking the whole ranking.
+    # It is computed from the ranking the first time it is asked for, and cached (and evicted) along with it.
+    def positions(self, closenessFactor, algorithm, origin=None):
+        if origin is None:
+            origin = self.store.origin
+        key = (origin, closenessFactor, algorithm)
+        ranking = self.rank(closenessFactor, algorithm, origin)
+        with self.lock:
+            positions = self.positionCache.get(key)
+        if positions is None:
+            positions = array("I", bytes(4 * len(self.store)))
+            for i, row in enumerate(ranking):
+                positions[row] = i
+            with self.lock:
+                if self.rankings.get(key) is ranking and key not in self.positionCache:
+                    self.positionCache[key] = positions
+                    self.bytesUsed += _sizeOf(positions)
+                    self._evict()
+        return positions
+
+    # Drops every ranking (for example, after the locations in the store change).
+    def clear(self):
+        with self.lock:
+            self.rankings.clear()
+            self.positionCache.clear()
+            self.bytesUsed = 0
+            self.warmQueue = []
+            self.generation += 1
+
+    # Moves the rows of changed locations to their new places in every cached ranking, takes out the removed ones and puts in the added ones
+    # (called by "ingest.applyDelta", after "LocationStore.update"). "before" and "newRows" are what "LocationStore.update" returned.
+    # Every ranking is copied first (the old one may still be in use on another thread), and each row is found with a binary search
+    # on its chompability, so the work grows with the number of changed rows rather than with the dataset.
+    def update(self, before, newRows):
+        if (len(before) + len(newRows)) * RERANK_RATIO > len(self.store):
+            self.clear()
+            return
+        with self.lock:
+            self.generation += 1
+            self.warmQueue = []
+            for key in list(self.rankings):
+                oldRanking = self.rankings[key]
+                ranking = self._rerank(key, oldRanking, before, newRows)
+                self.rankings[key] = ranking
+                self.bytesUsed += _sizeOf(ranking) - _sizeOf(oldRanking)
+                positions = self.positionCache.pop(key, None)
+                if positions is not None:
+                    self.bytesUsed -= _sizeOf(positions)
+            self._evict()
+
+    # Returns a copy of a ranking with the rows in "before" taken out (found by their old chompability) and "newRows" put in.
+    def _rerank(self, key, ranking, before, newRows):
+        origin, closenessFactor, algorithm = key
+        distanceToUF = self.store.distancesFrom(origin)
+        numFactor = self.store.numFactor
+        score = lambda row: scoring.chompabilityOf(distanceToUF[row], numFactor[row], closenessFactor)
+
+        # The rows in "before" are still in their old places, so they are compared by their old chompability while they are taken out.
+        oldScores = {}
+        for row, (oldNumFactor, oldDistances) in before.items():
+            oldDistance = oldDistances.get(origin)
+            if oldDistance is None:
+                oldDistance = distanceToUF[row]
+            oldScores[row] = scoring.chompabilityOf(oldDistance, oldNumFactor, closenessFactor)
+        oldScore = lambda row: oldScores[row] if row in oldScores else score(row)
+
+        ranking = array("I", ranking)
+        for row in before:
+            i = _find(ranking, row, oldScores[row], oldScore)
+            if i is not None:
+                del ranking[i]
+        for row in newRows:
+            ranking.insert(_bisectLeft(ranking, score(row), score), row)
+        return ranking
+
+    # Returns the ranking for a key and marks it as the most recently used (the lock must be held).
+    def _lookup(self, key):
+        ranking = self.rankings.get(key)
+        if ranking is not None:
+            self.rankings.move_to_end(key)
+        return ranking
+
+    # Computes a ranking, unless another thread is already computing it (in which case its result is waited for).
+    def _compute(self, key):
+        with self.lock:
+            ranking = self._lookup(key)
+            if ranking is not None:
+                return ranking
+            done = self.inProgress.get(key)
+            if done is None:
+                done = self.inProgress[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            done.wait()
+            with self.lock:
+                ranking = self._lookup(key)
+            # The other thread's ranking may already have been evicted; if so, it is computed again here.
+            return ranking if ranking is not None else self._compute(key)
+
+        try:
+            with self.lock:
+                generation = self.generation
+            origin, closenessFactor, algorithm = key
+            # The chompability values are calculated into a separate column, so the values on display are never changed.
+            keys = scoring.chompify(self.store.distancesFrom(origin), self.store.numFactor, closenessFactor, array("d", bytes(8 * len(self.store))))
+            ranking = sorting.sortOrder(keys, algorithm)
+            # Removed locations are still in the columns, but never in a ranking.
+            deleted = self.store.deleted
+            if deleted:
+                ranking = array("I", [row for row in ranking if row not in deleted])
+            with self.lock:
+                if generation == self.generation:
+                    self._insert(key, ranking)
+        finally:
+            with self.lock:
+                del self.inProgress[key]
+            done.set()
+        return ranking
+
+    # Stores a ranking and evicts the least recently used ones while the cache is over its memory cap (the lock must be held).
+    # The newest ranking is always kept, even if it alone is larger than the cap.
+    def _insert(self, key, ranking):
+        if key in self.rankings:
+            self._remove(key)
+        self.rankings[key] = ranking
+        self.bytesUsed += _sizeOf(ranking)
+        self._evict()
+
+    def _evict(self):
+        while self.bytesUsed > self.maxBytes and len(self.rankings) > 1:
+            self._remove(next(iter(self.rankings)))
+
+    def _remove(self, key):
+        self.bytesUsed -= _sizeOf(self.rankings.pop(key))
+        positions = self.positionCache.pop(key, None)
+        if positions is not None:
+            self.bytesUsed -= _sizeOf(positions)
+
+    def _warmLoop(self):
+        while True:
+            with self.lock:
+                while not self.warmQueue:
+                    self.warmCondition.wait()
+                key = self.warmQueue.pop(0)
+                if key in self.rankings:
+                    continue
+            self._compute(key)
+
+def _sizeOf(ranking):
+    return len(ranking) * ranking.itemsize
+
+# Returns the first place in a ranking (sorted by "score") whose score is not lower than "value".
+def _bisectLeft(ranking, value, score):
+    low, high = 0, len(ranking)
+    while low < high:
+        middle = (low + high) // 2
+        if score(ranking[middle]) < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+# Returns the place of a row in a ranking, or None if it is not in it. The row is looked for among the rows with the same score;
+# if it is not there (a ranking computed while the locations were being updated already has the row in its new place), every row is checked.
+def _find(ranking, row, value, score):
+    i = _bisectLeft(ranking, value, score)
+    while i < len(ranking) and score(ranking[i]) == value:
+        if ranking[i] == row:
+            return i
+        i += 1
+    try:
+        return ranking.index(row)
+    except ValueError:
+        return None
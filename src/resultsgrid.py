@@ -0,0 +1,97 @@
+# RESULTS GRID
+# Shows the ranked rows in the "TOP" Scroll Pane without creating widgets for every one of them.
+# Only VISIBLE_ROWS rows of labels are ever created (once, when the GUI is built); scrolling (with the scale next to the pane,
+# or the mouse wheel) just changes the text of those labels to the rows in view ("virtual scrolling":
+# https://en.wikipedia.org/wiki/Virtual_scrolling). Showing 150,346 rows therefore costs the same as showing 10.
+# The rows themselves stay in a compact array of row numbers (see "ranking.py"), and are only looked up in the store when in view.
+from instrumentation import metrics
+
+# The number of rows of labels, and how many rows one step of the mouse wheel scrolls by.
+VISIBLE_ROWS = 15
+WHEEL_STEP = 3
+
+# Every column of the grid: (label name, heading, width in characters).
+COLUMNS = [
+    ("locationPosition", "#", 7),
+    ("locationScore", "\"Chompability\"", 20),
+    ("locationName", "Name", 24),
+    ("locationAddress", "Address", 24),
+    ("locationCity", "City", 14),
+    ("locationState", "State", 6),
+    ("locationDistance", "Distance (km)", 12),
+    ("locationStars", "Stars", 6),
+    ("locationReviews", "Reviews", 8),
+    ("locationCategories", "Categories", 40),
+]
+
+# CLASS: ResultsGrid
+# Called with "ResultsGrid(app, store)" while the "TOP" Scroll Pane is open; "scrollName" is the scale that scrolls it,
+# which is added with "addScrollbar" wherever it should go (next to the pane).
+class ResultsGrid:
+    def __init__(self, app, store, scrollName="ResultsScroll"):
+        self.app = app
+        self.store = store
+        self.scrollName = scrollName
+        self.rows = []
+        self.scores = []
+        self.distances = []
+        self.offset = 0
+
+        # Headings.
+        for column, (name, heading, width) in enumerate(COLUMNS):
+            label = app.addLabel(name, heading, row=0, column=column)
+            label.config(font="Helvetica 12 underline", width=width, anchor="w")
+            self._bindWheel(label)
+
+        # The (initially empty) labels of every visible row.
+        for i in range(VISIBLE_ROWS):
+            for column, (name, heading, width) in enumerate(COLUMNS):
+                label = app.addLabel(name + str(i + 1), "", row=i + 1, column=column)
+                label.config(width=width, anchor="w")
+                self._bindWheel(label)
+
+    # Adds the vertical scale that scrolls the grid, at the given position of the current container.
+    def addScrollbar(self, row=None, column=0, rowspan=0):
+        scale = self.app.addScale(self.scrollName, row=row, column=column, rowspan=rowspan)
+        self.app.setScaleVertical(self.scrollName)
+        self.app.setScaleRange(self.scrollName, 0, 0, curr=0)
+        self.app.setScaleChangeFunction(self.scrollName, lambda name: self.scrollTo(int(self.app.getScale(name)), moveScale=False))
+        self._bindWheel(scale)
+        return scale
+
+    # Shows new rows (any sequence of row numbers, from first to last place) and their chompability ("scores", in the same order),
+    # starting from the top. "distances" is the distance column (indexed by row) that the scores were calculated with; the store's
+    # own "distanceToUF" is not used, since the next query may already have moved it to another origin.
+    def show(self, rows, scores, distances):
+        with metrics.timer("display"):
+            self.rows = rows
+            self.scores = scores
+            self.distances = distances
+            self.app.setScaleRange(self.scrollName, 0, max(0, len(rows) - VISIBLE_ROWS), curr=0)
+            self.scrollTo(0)
+
+    # Fills the labels with the rows from "offset" on (blanking the labels past the last row).
+    def scrollTo(self, offset, moveScale=True):
+        offset = max(0, min(offset, len(self.rows) - VISIBLE_ROWS))
+        self.offset = offset
+        if moveScale:
+            self.app.setScale(self.scrollName, offset, callFunction=False)
+        metrics.count("display.rowsRendered", max(0, min(VISIBLE_ROWS, len(self.rows) - offset)))
+        for i in range(VISIBLE_ROWS):
+            place = offset + i
+            if place < len(self.rows):
+                row = self.rows[place]
+                location = self.store[row]
+                values = [str(place + 1), str(self.scores[place]), location.name, location.address, location.city, location.state,
+                          str(self.distances[row]), str(location.stars), str(location.numReviews),
+                          ', '.join(location.categories)] # https://elearning.wsldp.com/python3/how-to-convert-python-list-to-comma-separated-string/
+            else:
+                values = [""] * len(COLUMNS)
+            for (name, heading, width), value in zip(COLUMNS, values):
+                self.app.setLabel(name + str(i + 1), value)
+
+    # Scrolls with the mouse wheel over any part of the grid ("<MouseWheel>" on Windows and macOS, buttons 4 and 5 on Linux).
+    def _bindWheel(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self.scrollTo(self.offset - WHEEL_STEP if event.delta > 0 else self.offset + WHEEL_STEP))
+        widget.bind("<Button-4>", lambda event: self.scrollTo(self.offset - WHEEL_STEP))
+        widget.bind("<Button-5>", lambda event: self.scrollTo(self.offset + WHEEL_STEP))
@@ -0,0 +1,98 @@
+# BATCH SCORING
+# Calculates the "Chompability" (and the distance to the origin) of every location at once, straight from the columns of a LocationStore.
+# The formulas are plain arithmetic on whole columns, so when NumPy (https://numpy.org/) is installed,
+# every column is calculated by NumPy's compiled loops instead of one Python operation at a time.
+# NumPy is optional: without it, the same formulas run as (slower) pure Python loops, and give the same results
+# (including for a location at a distance of 0 km from the origin, which is infinitely "chompable").
+import math
+from array import array
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# chompability = ((100 / closenessFactor) * (1000 / distanceToUF)) + (numFactor / (100 - closenessFactor))
+# where closenessFactor is the *USER-INPUTTED* "closeness factor" (1 to 100), and 1000 / 0 is infinity (as NumPy gives).
+# A closeness factor of 100 means "anywhere at all", so the distance is ignored and chompability = numFactor.
+# The results are written into "out" (an array of doubles as long as the columns), which is also returned.
+# Called with "chompify(store.distanceToUF, store.numFactor, closenessFactor, store.chompability)".
+def chompify(distanceToUF, numFactor, closenessFactor, out):
+    if numpy is not None:
+        _chompifyNumPy(distanceToUF, numFactor, closenessFactor, out)
+    else:
+        _chompifyPython(distanceToUF, numFactor, closenessFactor, out)
+    return out
+
+# Each operation below runs over the whole column, in the same order as the formula above
+# (so every value matches the pure Python result exactly). numpy.asarray wraps the columns without copying them.
+def _chompifyNumPy(distanceToUF, numFactor, closenessFactor, out):
+    result = numpy.asarray(out)
+    if (closenessFactor == 100):
+        result[:] = numpy.asarray(numFactor)
+        return
+    with numpy.errstate(divide="ignore"):
+        numpy.divide(1000, numpy.asarray(distanceToUF), out=result)
+    result *= (100 / closenessFactor)
+    result += numpy.asarray(numFactor) / (100 - closenessFactor)
+
+def _chompifyPython(distanceToUF, numFactor, closenessFactor, out):
+    if (closenessFactor == 100):
+        out[:] = array("d", numFactor)
+    else:
+        closeness = 100 / closenessFactor
+        remainder = 100 - closenessFactor
+        inf = float("inf")
+        out[:] = array("d", [(closeness * ((1000 / distance) if distance else inf)) + (factor / remainder) for distance, factor in zip(distanceToUF, numFactor)])
+
+# The same formula for a single location (used when only a few locations need a score, so scoring the whole column would be wasted).
+# The operations are done in the same order as above, so the value is identical to the one in the column.
+def chompabilityOf(distanceToUF, numFactor, closenessFactor):
+    if (closenessFactor == 100):
+        return numFactor
+    return ((100 / closenessFactor) * ((1000 / distanceToUF) if distanceToUF else float("inf"))) + (numFactor / (100 - closenessFactor))
+
+# Returns a function giving the chompability of one row, from the columns (used to score only the rows a query matches).
+# The constant parts of the formula are worked out once; the value is identical to "chompabilityOf", including for a distance of 0 km.
+def rowScorer(distanceToUF, numFactor, closenessFactor):
+    if (closenessFactor == 100):
+        return numFactor.__getitem__
+    closeness = 100 / closenessFactor
+    remainder = 100 - closenessFactor
+    inf = float("inf")
+    return lambda row: (closeness * ((1000 / distanceToUF[row]) if distanceToUF[row] else inf)) + (numFactor[row] / remainder)
+
+# NUMBER FACTOR
+# numFactor = numReviews / (5.0 / stars): the "popularity" part of chompability, for every location at once ("numFactors", an array of doubles)
+# or for a single location ("numFactorOf").
+def numFactors(numReviews, stars):
+    if numpy is not None:
+        return array("d", (numpy.asarray(numReviews) / (5.0 / numpy.asarray(stars, dtype="d"))).tobytes())
+    return array("d", [numFactorOf(reviews, numStars) for reviews, numStars in zip(numReviews, stars)])
+
+def numFactorOf(numReviews, stars):
+    return numReviews / (5.0 / stars)
+
+# DISTANCES
+# The Haversine formula of "distance" (in "locationstore.py"), for every location at once: the distance in KILOMETERS
+# (rounded up to the nearest integer) from every (latitude, longitude) pair to the origin, written into "out" (an array of integers).
+# Called with "distances(store.latitude, store.longitude, originLatitude, originLongitude, out)".
+def distances(latitude, longitude, originLatitude, originLongitude, out):
+    if numpy is not None:
+        _distancesNumPy(latitude, longitude, originLatitude, originLongitude, out)
+    else:
+        _distancesPython(latitude, longitude, originLatitude, originLongitude, out)
+    return out
+
+def _distancesNumPy(latitude, longitude, originLatitude, originLongitude, out):
+    p = math.pi / 180
+    latitude = numpy.asarray(latitude)
+    longitude = numpy.asarray(longitude)
+    a = 0.5 - (numpy.cos((originLatitude - latitude) * p) / 2) + numpy.cos(latitude * p) * math.cos(originLatitude * p) * ((1 - numpy.cos((originLongitude - longitude) * p)) / 2)
+    numpy.asarray(out)[:] = numpy.ceil(12742 * numpy.arcsin(numpy.sqrt(a)))
+
+def _distancesPython(latitude, longitude, originLatitude, originLongitude, out):
+    p = math.pi / 180
+    cos, asin, sqrt, ceil = math.cos, math.asin, math.sqrt, math.ceil
+    cosOrigin = cos(originLatitude * p)
+    out[:] = array(out.typecode, [ceil(12742 * asin(sqrt(0.5 - (cos((originLatitude - lat) * p) / 2) + cos(lat * p) * cosOrigin * ((1 - cos((originLongitude - lon) * p)) / 2))))
+                                  for lat, lon in zip(latitude, longitude)])
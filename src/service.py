@@ -0,0 +1,267 @@
+# HEADLESS SERVICE
+# Loads the dataset, builds the indexes and answers ranked queries, all without a display; the GUI ("chomp.py") is one client of it,
+# and the local HTTP server below is another. The store and the indexes are loaded once and kept in memory,
+# so every request is answered by the query engine (see "query.py") straight away.
+# Run with "python service.py" (add "--port 8080", "--host 0.0.0.0" or "--dataset <path>" as needed), then ask, for example:
+#   http://127.0.0.1:8080/query?category=Pizza&city=Gainesville&state=FL&closeness=20&top=10
+# or, for the most chompable of the 50 locations nearest to a point (distances measured from that point):
+#   http://127.0.0.1:8080/query?nearest=29.65,-82.32&k=50&origin=29.65,-82.32&top=10
+# which answers with JSON: {"query": {...}, "count": 10, "milliseconds": 1.2, "results": [{"place": 1, "name": ..., ...}, ...]}.
+# A location at a distance of 0 km from the origin is infinitely "chompable"; JSON has no infinity, so its "chompability" is null.
+# The data can be updated without restarting, by POSTing a delta file (see "ingest.py") to /delta, or with "--delta <path>" at startup.
+import argparse
+# Python's native HTTP server (https://docs.python.org/3/library/http.server.html); "ThreadingHTTPServer" answers every
+# request on its own thread, so one slow query does not hold up the others.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import sys
+import threading
+import time
+import traceback
+from urllib.parse import parse_qs, urlsplit
+from indexes import LocationIndexes
+from ingest import Delta, applyDelta
+from loader import DATASET_PATH
+from locationstore import loadStore
+from query import Query, QueryEngine
+from instrumentation import metrics
+
+# The most rows a single request may ask for (the size of the dataset).
+MAX_ROWS = 150346
+
+# CLASS: ChompService
+# Called with "ChompService.load(datasetPath)". Holds the store, the sets of categories, states and cities, the indexes and the query engine.
+class ChompService:
+    def __init__(self, store, categories, states, cities):
+        self.store = store
+        self.categories = categories
+        self.states = states
+        self.cities = cities
+
+        with metrics.timer("index.build"):
+            self.indexes = LocationIndexes(store)
+        print("Indexed " + str(len(store)) + " locations (" + metrics.summary(["index.build"]) + ")")
+        self.engine = QueryEngine(store, self.indexes)
+        # Held while an update is applied, so two updates never run at the same time.
+        self.updateLock = threading.Lock()
+
+    @classmethod
+    def load(cls, datasetPath=DATASET_PATH):
+        return cls(*loadStore(datasetPath))
+
+    # Applies a Delta (see "ingest.py") to the store, the indexes and the query engine, and (if given) to a RankingCache.
+    # Returns a dictionary that can be turned into JSON, with the number of locations added, changed and removed.
+    def applyDelta(self, delta, rankings=None):
+        with self.updateLock:
+            numAdded, numChanged, numRemoved = applyDelta(delta, self.store, self.indexes, rankings, self.engine)
+            for record in delta.upserts:
+                self.cities.add(record[3])
+                self.states.add(record[4])
+                self.categories.update(record[9])
+        return {"added": numAdded, "changed": numChanged, "removed": numRemoved, "locations": len(self.store) - len(self.store.deleted),
+                "milliseconds": metrics.timers["ingest.apply"][3] * 1000}
+
+    # Answers a query (see "Query" in "query.py"). Returns a dictionary that can be turned into JSON:
+    # the query, how long it took, and every row shown, with its place, chompability and the location's details.
+    def run(self, query):
+        start = time.perf_counter()
+        rows, scores = self.engine.run(query)
+        milliseconds = (time.perf_counter() - start) * 1000
+
+        origin = query.origin if query.origin is not None else self.store.origin
+        distances = self.store.distancesFrom(origin)
+        results = []
+        for place, (row, score) in enumerate(zip(rows, scores), 1):
+            location = self.store[row]
+            results.append({
+                "place": place,
+                "chompability": score if math.isfinite(score) else None,
+                "id": location.ID,
+                "name": location.name,
+                "address": location.address,
+                "city": location.city,
+                "state": location.state,
+                "distance": distances[row],
+                "stars": location.stars,
+                "reviews": location.numReviews,
+                "categories": location.categories,
+            })
+        return {
+            "query": {
+                "categories": query.categories,
+                "state": query.state,
+                "city": query.city,
+                "closeness": query.closeness,
+                "direction": query.direction,
+                "rows": query.numRows,
+                "match": "all" if query.matchAll else "any",
+                "near": query.near,
+                "nearest": query.nearest,
+                "origin": origin,
+            },
+            "count": len(results),
+            "milliseconds": milliseconds,
+            "results": results,
+        }
+
+# Turns the parameters of a request ({name: [values]}, as returned by "urllib.parse.parse_qs") into a Query.
+# Raises ValueError (with a message for the client) if a parameter is not valid.
+def parseQuery(parameters):
+    def one(name, default=None):
+        values = parameters.get(name)
+        return values[-1] if values else default
+
+    def number(name, default, convert=float):
+        value = one(name)
+        if value is None:
+            return default
+        try:
+            return convert(value)
+        except ValueError:
+            raise ValueError("\"" + name + "\" must be a number, not \"" + value + "\"") from None
+
+    def point(name):
+        value = one(name)
+        if value is None:
+            return None
+        try:
+            latitude, longitude = (float(part) for part in value.split(","))
+        except ValueError:
+            raise ValueError("\"" + name + "\" must be \"latitude,longitude\", not \"" + value + "\"") from None
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("\"" + name + "\" is out of range")
+        return (latitude, longitude)
+
+    closeness = number("closeness", 1, int)
+    if not 1 <= closeness <= 100:
+        raise ValueError("\"closeness\" must be between 1 and 100")
+    if "bottom" in parameters:
+        direction, numRows = "Bottom", number("bottom", 10, int)
+    else:
+        direction, numRows = "Top", number("top", 10, int)
+    if not 1 <= numRows <= MAX_ROWS:
+        raise ValueError("the number of rows must be between 1 and " + str(MAX_ROWS))
+    match = one("match", "all").lower()
+    if match not in ("all", "any"):
+        raise ValueError("\"match\" must be \"all\" or \"any\"")
+
+    near = point("near")
+    if near is not None:
+        radius = number("radius", 10.0)
+        if not (math.isfinite(radius) and radius > 0):
+            raise ValueError("\"radius\" must be a number of kilometers greater than 0")
+        near = (near[0], near[1], radius)
+    nearest = point("nearest")
+    if nearest is not None:
+        k = number("k", 10, int)
+        if not 1 <= k <= MAX_ROWS:
+            raise ValueError("\"k\" must be between 1 and " + str(MAX_ROWS))
+        nearest = (nearest[0], nearest[1], k)
+    return Query(parameters.get("category", []), one("state", "Any"), one("city", ''), closeness, direction, numRows,
+                 matchAll=(match == "all"), near=near, origin=point("origin"), nearest=nearest)
+
+# CLASS: QueryHandler
+# Answers "GET /query?..." with the results of a query, "GET /health" with the size of the dataset,
+# and "GET /metrics" with every timer and counter (see "instrumentation.py").
+# "POST /delta" applies the update in the body of the request (the lines of a delta file, see "ingest.py").
+# A request that is not valid is answered with 400, and one that fails while it is answered with 500 (both with {"error": ...}),
+# so the client always gets a reply.
+# "service" is set on the subclass made by "makeServer".
+class QueryHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._reply(200, {"status": "ok", "locations": len(self.service.store) - len(self.service.store.deleted)})
+        elif url.path == "/metrics":
+            self._reply(200, metrics.snapshot())
+        elif url.path == "/query":
+            try:
+                query = parseQuery(parse_qs(url.query))
+            except ValueError as error:
+                self._reply(400, {"error": str(error)})
+                return
+            try:
+                result = self.service.run(query)
+            except Exception as error:
+                self._fail(error)
+                return
+            self._reply(200, result)
+        else:
+            self._reply(404, {"error": "unknown path \"" + url.path + "\" (try /query, /health or /metrics)"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/delta":
+            self._reply(404, {"error": "unknown path \"" + url.path + "\" (try /delta)"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError("it is negative")
+        except ValueError as error:
+            self._reply(400, {"error": "\"Content-Length\" must be the length of the body (" + str(error) + ")"})
+            return
+        body = self.rfile.read(length)
+        try:
+            delta = Delta.parse(body.decode("utf-8").splitlines())
+        except (UnicodeDecodeError, ValueError) as error:
+            self._reply(400, {"error": str(error)})
+            return
+        try:
+            result = self.service.applyDelta(delta)
+        except Exception as error:
+            self._fail(error)
+            return
+        self._reply(200, result)
+
+    # Answers with 500 when answering a valid request failed (the error is also logged, with its traceback, to stderr).
+    def _fail(self, error):
+        self.log_error("%s failed: %s", self.path, traceback.format_exc())
+        self._reply(500, {"error": type(error).__name__ + ": " + str(error)})
+
+    def _reply(self, status, body):
+        # allow_nan=False: a value that is not valid JSON (Infinity, NaN) fails the request (with 500) instead of reaching a client.
+        try:
+            data = json.dumps(body, allow_nan=False).encode("utf-8")
+        except ValueError as error:
+            self._fail(error)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+# Returns an HTTP server (not yet started) that answers queries with a service.
+def makeServer(service, host="127.0.0.1", port=8080):
+    handler = type("ServiceQueryHandler", (QueryHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer \"chompability\" queries over HTTP, as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--dataset", default=None, help="the path of the Yelp dataset file")
+    parser.add_argument("--delta", action="append", default=[], metavar="PATH", help="an update to apply after loading (can be given several times, applied in order)")
+    args = parser.parse_args(argv)
+
+    service = ChompService.load(args.dataset or DATASET_PATH)
+    for deltaPath in args.delta:
+        print("Applied " + deltaPath + ": " + json.dumps(service.applyDelta(Delta.read(deltaPath))))
+    server = makeServer(service, args.host, args.port)
+    print("Serving on http://" + args.host + ":" + str(server.server_address[1]) + "/query")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# BINARY COLUMNAR SNAPSHOT CACHE
+# Parsing the Yelp dataset (and calculating the distance of every location to UF) takes seconds, yet the result is the same on every launch.
+# After the first launch, the parsed data is written into a compact binary "snapshot" file next to the dataset, which later launches
+# open with "mmap" (https://docs.python.org/3/library/mmap.html) instead of parsing the .json file again.
+# The snapshot is rebuilt only when the size or the modification time of the .json file changes.
+#
+# FILE LAYOUT (all numbers are in the byte order recorded in the header, every section starts on an 8-byte boundary):
+    # header: magic, version, byte order, row count, source file size, source file modification time, section count
+    # section table: (name, type code, offset, item count) for every section
+    # numeric columns: latitude, longitude, stars, numReviews, distanceToUF, numFactor (one value per location)
+    # row string tables: business IDs, names, addresses (a UTF-8 "blob" plus offsets, decoded one string at a time)
+    # interned string tables: cities, states, categories (every distinct string stored once, plus a per-location array of integer codes)
+    # categories of each location: a flat array of category codes, plus offsets marking where each location's categories start
+import mmap
+import os
+import os.path
+# Python has a native library for packing numbers into bytes (https://docs.python.org/3/library/struct.html).
+import struct
+import sys
+# Python has a native library for compact arrays of numbers (https://docs.python.org/3/library/array.html).
+from array import array
+
+MAGIC = b"CHOMPSNP"
+VERSION = 2
+
+# magic (8 bytes), version, byte order ("l" or "b"), row count, source size, source modification time (nanoseconds), section count.
+HEADER = struct.Struct("<8sIcxxxIQQI")
+# section name (24 bytes), array type code, offset, item count.
+SECTION = struct.Struct("<24sc7xQQ")
+
+# The numeric columns and their array type codes ("d" = double, "i" = 32-bit integer).
+NUMERIC_COLUMNS = (("latitude", "d"), ("longitude", "d"), ("stars", "d"), ("numReviews", "i"), ("distanceToUF", "i"), ("numFactor", "d"))
+
+# Returns the path of the snapshot belonging to a dataset file (the same name, with a ".snapshot" extension).
+def snapshotPathFor(datasetPath):
+    return os.path.splitext(datasetPath)[0] + ".snapshot"
+
+# STRING TABLE
+# A list of strings stored as one UTF-8 "blob" and an array of offsets into it;
+# string "i" is blob[offsets[i]:offsets[i + 1]], and is only decoded when it is asked for.
+class StringTable:
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+# Encodes a list of strings into a blob and an array of offsets.
+def _encodeStrings(strings):
+    offsets = array("I", [0])
+    parts = []
+    total = 0
+    for string in strings:
+        encoded = string.encode("utf-8")
+        parts.append(encoded)
+        total += len(encoded)
+        offsets.append(total)
+    return b"".join(parts), offsets
+
+# WRITING
+# Called with "writeSnapshot(snapshotPathFor(datasetPath), datasetPath, store)", where "store" is a LocationStore.
+# The cities, states and categories are written with the codes and tables they already have in the store (see "encoding.py").
+# The file is written under a temporary name first and then renamed, so a half-written snapshot is never opened.
+def writeSnapshot(snapshotPath, datasetPath, store):
+    sourceStat = os.stat(datasetPath)
+
+    sections = []
+    for name, typecode in NUMERIC_COLUMNS:
+        sections.append((name, array(typecode, getattr(store, name))))
+
+    for name in ("ids", "names", "addresses"):
+        blob, offsets = _encodeStrings(getattr(store, name))
+        sections.append((name + "Blob", array("B", blob)))
+        sections.append((name + "Offsets", offsets))
+
+    for name, column in (("city", store.cities), ("state", store.states)):
+        blob, offsets = _encodeStrings(column.dictionary.table)
+        sections.append((name + "Blob", array("B", blob)))
+        sections.append((name + "Offsets", offsets))
+        sections.append((name + "Codes", array("I", column.codes)))
+
+    blob, offsets = _encodeStrings(store.categories.dictionary.table)
+    sections.append(("categoryBlob", array("B", blob)))
+    sections.append(("categoryOffsets", offsets))
+    # The codes of every location, one after the other (a changed location's codes may be anywhere in the store's flat array).
+    rowCategoryCodes = array("I")
+    rowCategoryOffsets = array("I", [0])
+    for row in range(len(store)):
+        rowCategoryCodes.extend(store.categories.codesOf(row))
+        rowCategoryOffsets.append(len(rowCategoryCodes))
+    sections.append(("rowCategoryCodes", rowCategoryCodes))
+    sections.append(("rowCategoryOffsets", rowCategoryOffsets))
+
+    # Laying the sections out one after the other, each on an 8-byte boundary.
+    offset = _align(HEADER.size + SECTION.size * len(sections))
+    table = []
+    for name, values in sections:
+        table.append((name, values, offset))
+        offset = _align(offset + len(values) * values.itemsize)
+
+    byteOrder = b"l" if sys.byteorder == "little" else b"b"
+    temporaryPath = snapshotPath + ".tmp"
+    with open(temporaryPath, "wb") as snapshotFile:
+        snapshotFile.write(HEADER.pack(MAGIC, VERSION, byteOrder, len(store), sourceStat.st_size, sourceStat.st_mtime_ns, len(sections)))
+        for name, values, sectionOffset in table:
+            snapshotFile.write(SECTION.pack(name.encode("ascii"), values.typecode.encode("ascii"), sectionOffset, len(values)))
+        for name, values, sectionOffset in table:
+            snapshotFile.write(b"\0" * (sectionOffset - snapshotFile.tell()))
+            values.tofile(snapshotFile)
+    os.replace(temporaryPath, snapshotPath)
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+# READING
+# SNAPSHOT
+# An opened snapshot file. Every numeric column is a memoryview straight into the mapped file (nothing is copied or parsed);
+# the tables of distinct cities, states and categories are small, so they are decoded into lists of strings straight away.
+class Snapshot:
+    def __init__(self, snapshotFile, mapped, rowCount, sections):
+        self.file = snapshotFile
+        self.mapped = mapped
+        self.rowCount = rowCount
+
+        for name, typecode in NUMERIC_COLUMNS:
+            setattr(self, name, sections[name])
+
+        self.ids = StringTable(sections["idsBlob"], sections["idsOffsets"])
+        self.names = StringTable(sections["namesBlob"], sections["namesOffsets"])
+        self.addresses = StringTable(sections["addressesBlob"], sections["addressesOffsets"])
+
+        self.cityTable = list(StringTable(sections["cityBlob"], sections["cityOffsets"]))
+        self.cityCodes = sections["cityCodes"]
+        self.stateTable = list(StringTable(sections["stateBlob"], sections["stateOffsets"]))
+        self.stateCodes = sections["stateCodes"]
+        self.categoryTable = list(StringTable(sections["categoryBlob"], sections["categoryOffsets"]))
+        self.rowCategoryCodes = sections["rowCategoryCodes"]
+        self.rowCategoryOffsets = sections["rowCategoryOffsets"]
+
+    def __len__(self):
+        return self.rowCount
+
+# Called with "openSnapshot(snapshotPathFor(datasetPath), datasetPath)".
+# Returns a Snapshot, or None if the snapshot does not exist, is unreadable, or no longer matches the .json file.
+def openSnapshot(snapshotPath, datasetPath):
+    try:
+        sourceStat = os.stat(datasetPath)
+        snapshotFile = open(snapshotPath, "rb")
+    except OSError:
+        return None
+
+    try:
+        mapped = mmap.mmap(snapshotFile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteOrder, rowCount, sourceSize, sourceMtime, sectionCount = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION or byteOrder != (b"l" if sys.byteorder == "little" else b"b"):
+            raise ValueError("incompatible snapshot")
+        if sourceSize != sourceStat.st_size or sourceMtime != sourceStat.st_mtime_ns:
+            raise ValueError("stale snapshot")
+
+        view = memoryview(mapped)
+        sections = {}
+        for i in range(sectionCount):
+            name, typecode, offset, count = SECTION.unpack_from(mapped, HEADER.size + i * SECTION.size)
+            typecode = typecode.decode("ascii")
+            itemSize = array(typecode).itemsize
+            if offset + count * itemSize > len(mapped):
+                raise ValueError("truncated snapshot")
+            sections[name.rstrip(b"\0").decode("ascii")] = view[offset:offset + count * itemSize].cast(typecode)
+        return Snapshot(snapshotFile, mapped, rowCount, sections)
+    except (ValueError, KeyError, struct.error):
+        snapshotFile.close()
+        return None
@@ -0,0 +1,399 @@
+# SORTING ALGORITHMS
+# The two sorting algorithms of "chomp" (Quick Sort & Heap Sort). Both sort an array of locations by their "Chompability" score,
+# from the LOWEST chompability (index 0) to the HIGHEST chompability (last index).
+# "Intro Sort" (further below) is a faster and safer version of Quick Sort, offered alongside it.
+# System was imported because the recursion limit was reached when using QuickSort (Intro Sort does not recurse).
+import sys
+from array import array
+# Python's native heap queue (https://docs.python.org/3/library/heapq.html) is used to select the top (or bottom) rows without a full sort.
+import heapq
+# Every sorting algorithm rearranges light views of rows (see "locationstore.py").
+from locationstore import LocationView
+# The comparisons and swaps of the original algorithms are counted (see "instrumentation.py").
+from instrumentation import metrics
+sys.setrecursionlimit(2000)
+
+# QUICKSORT - called with "quickSort(locations, 0, len(locations) - 1)".
+# Reference: https://www.geeksforgeeks.org/python-program-for-quicksort/
+def rearrange(locationArray, low, high):
+    # Defining the index of the smaller element.
+	smallerElementIndex = (low - 1) # Note that this is equal to the "up" pointer, and "high" is equivalent to the "down" pointer.
+    # Defining the pivot as the LAST element in the array.
+	pivot = locationArray[high].chompability
+    # For every element in the array:
+	for i in range(low, high):
+        # If the current element is less than or equal to the pivot:
+		if locationArray[i].chompability <= pivot:
+			# Increment index of the smaller element.
+			smallerElementIndex += 1
+            # Swap the original smallest element with the next smallest element. 
+			locationArray[smallerElementIndex], locationArray[i] = locationArray[i], locationArray[smallerElementIndex]
+
+    # Swap the current pivot location (locationArray[high]) with the index one greater than the next element smaller than it.
+    # (found by the for loop above).
+	locationArray[smallerElementIndex + 1], locationArray[high] = locationArray[high], locationArray[smallerElementIndex + 1]
+	# Counting the work of this pass (once, instead of inside the loop): one comparison per element,
+	# and one swap per element not greater than the pivot, plus the pivot's own swap.
+	metrics.count("quickSort.comparisons", high - low)
+	metrics.count("quickSort.swaps", smallerElementIndex + 2 - low)
+    # Return the sorted element's index.
+	return (smallerElementIndex + 1)
+
+def quickSort(locationArray, low, high):
+    # If the array passed in is 1 element long, it is sorted and will be returned.
+	if len(locationArray) == 1:
+		return locationArray
+	if low < high:
+        # The array must be rearranged such that all elements <= the pivot
+        # (in this case, the last element), are in the left sub-array and
+        # all elements > pivot are in the right sub-array.
+
+		# The integer at sortedElementIndex represents the location of the pivot AFTER
+        # one pass of QuickSort, as "rearrange" moves it.
+		sortedElementIndex = rearrange(locationArray, low, high)
+        # Recursively calling the function on the left sub-array.
+		quickSort(locationArray, low, sortedElementIndex - 1)
+        # Recursively calling the function on the right sub-array.
+		quickSort(locationArray, sortedElementIndex + 1, high)
+
+# HEAPIFY
+# Reference: https://www.geeksforgeeks.org/python-program-for-heap-sort/
+# Returns the (comparisons, swaps) of this sift-down, so every sort adds up its own counts (two sorts running at once
+# on different threads never mix them up), and hands them to the metrics once it is done.
+def heapify(locationArray, heapSize, root):
+    # The index of the largest value is initialized as the root.
+    largestIndex = root
+    # The left child in array notation is equal to 2 * index + 1.
+    left = 2 * root + 1
+    # The right child in array notation is equal to 2 * index + 2.
+    right = 2 * root + 2
+
+    # If a left child exists for the root AND if it is greater than the root:
+    if left < heapSize and locationArray[left].chompability > locationArray[root].chompability:
+        # The index of the largest value is reassigned to be the left child.
+        largestIndex = left
+
+    # If a right child exists for the root AND if it is greater than the root:
+    if right < heapSize and locationArray[right].chompability > locationArray[largestIndex].chompability:
+        largestIndex = right
+
+    # Counting the comparisons above (one for each child that exists).
+    comparisons = (left < heapSize) + (right < heapSize)
+    
+    # If the index of the largest value is NOT equal to the inputted root, swap them.
+    if largestIndex != root:
+        locationArray[root], locationArray[largestIndex] = locationArray[largestIndex], locationArray[root]
+
+        # Heapify with the new (larger) root index.
+        belowComparisons, belowSwaps = heapify(locationArray, heapSize, largestIndex)
+        return comparisons + belowComparisons, 1 + belowSwaps
+    return comparisons, 0
+
+# HEAPSORT - called with "heapSort(locations)". Returns its (comparisons, swaps).
+# Reference: https://www.geeksforgeeks.org/python-program-for-heap-sort/
+def heapSort(locationArray):
+    comparisons = swaps = 0
+    # Finding the length of the inputted array.
+    arrayLength = len(locationArray)
+    # Defining the last parent index as the floor of the array length divided by two, minus one.
+    lastParentIndex = arrayLength // 2 - 1
+    # For every element starting from the last parent index and decrementing to index 0:
+    for i in range(lastParentIndex, -1, -1):
+        # Heapify the inputted array.
+        heapComparisons, heapSwaps = heapify(locationArray, arrayLength, i)
+        comparisons += heapComparisons
+        swaps += heapSwaps
+    # The array itself is now a max heap.
+
+    # Now, each element is extracted.
+    # For every element in the max heap, starting from the final element and decrementing to index 1:
+    for j in range(arrayLength - 1, 0, -1):
+        # Swap the first and last elements of the array.
+        locationArray[j], locationArray[0] = locationArray[0], locationArray[j]
+        # Heapify the altered array.
+        heapComparisons, heapSwaps = heapify(locationArray, j, 0)
+        comparisons += heapComparisons
+        swaps += heapSwaps
+
+    # Handing the counts to the metrics (the swaps of the loop above are added here too). This sort is only used
+    # for comparison (see "recursiveHeapSortOrder"), so it is counted apart from the heap sort that ranks the locations.
+    swaps += max(arrayLength - 1, 0)
+    metrics.count("recursiveHeapSort.comparisons", comparisons)
+    metrics.count("recursiveHeapSort.swaps", swaps)
+    return comparisons, swaps
+
+# BOTTOM-UP HEAPSORT - called with "fastHeapSort(keys, rows)".
+# Reference: https://en.wikipedia.org/wiki/Heapsort#Bottom-up_heapsort
+# The same algorithm as "heapSort" above, made cheaper in three ways:
+    # it works on a flat list of chompability values (with a parallel list of row numbers) instead of reading ".chompability"
+    # from location objects several times per comparison;
+    # every sift-down is a loop, not a recursive call, and moves a "hole" down the heap instead of swapping at every level;
+    # after the largest value is moved to the end, the value taken from the end is placed back with Floyd's method: the hole at
+    # the root is first moved all the way down along the larger children (one comparison per level), and the value is then
+    # moved back up from that leaf, which is usually only a level or two (https://doi.org/10.1145/355588.365103).
+# "keys" and "rows" are rearranged together, in place, from the LOWEST to the HIGHEST value.
+# Returns its (comparisons, moves): a "move" copies one value (and its row) into the hole, which is the work a swap does in "heapSort".
+# They are counted in local variables (a few per level of the heap), so the counts of one sort are never mixed with another's.
+def fastHeapSort(keys, rows):
+    size = len(keys)
+    comparisons = moves = 0
+
+    # Building the max heap, from the last parent up to the root.
+    for hole in range(size // 2 - 1, -1, -1):
+        key = keys[hole]
+        row = rows[hole]
+        child = 2 * hole + 1
+        while child < size:
+            if child + 1 < size:
+                comparisons += 1
+                if keys[child + 1] > keys[child]:
+                    child += 1
+            comparisons += 1
+            if keys[child] <= key:
+                break
+            keys[hole] = keys[child]
+            rows[hole] = rows[child]
+            moves += 1
+            hole = child
+            child = 2 * hole + 1
+        keys[hole] = key
+        rows[hole] = row
+
+    # Extracting the largest value "size - 1" times.
+    for end in range(size - 1, 0, -1):
+        key = keys[end]
+        row = rows[end]
+        keys[end] = keys[0]
+        rows[end] = rows[0]
+
+        # Moving the hole from the root down to a leaf, always towards the larger child.
+        hole = 0
+        child = 1
+        while child < end:
+            if child + 1 < end:
+                comparisons += 1
+                if keys[child + 1] > keys[child]:
+                    child += 1
+            keys[hole] = keys[child]
+            rows[hole] = rows[child]
+            hole = child
+            child = 2 * hole + 1
+        # One move for every level the hole went down.
+        moves += (hole + 1).bit_length() - 1
+
+        # Moving the value that was at the end back up from the leaf to its place.
+        while hole > 0:
+            parent = (hole - 1) // 2
+            comparisons += 1
+            if keys[parent] >= key:
+                break
+            keys[hole] = keys[parent]
+            rows[hole] = rows[parent]
+            moves += 1
+            hole = parent
+        keys[hole] = key
+        rows[hole] = row
+
+    # The largest value is moved to the end once per extraction.
+    moves += max(size - 1, 0)
+    return comparisons, moves
+
+# Sorts an array of locations like "heapSort" does, but with "fastHeapSort": the chompability values are read once,
+# and the locations themselves are rearranged only once, at the end.
+def heapSortLocations(locationArray):
+    keys = [location.chompability for location in locationArray]
+    rows = list(range(len(locationArray)))
+    fastHeapSort(keys, rows)
+    locationArray[:] = [locationArray[row] for row in rows]
+
+# INTROSORT - called with "introSort(keys, rows)".
+# Reference: https://en.wikipedia.org/wiki/Introsort
+# An iterative, introspective version of Quick Sort, whose worst case is bounded at O(n log n):
+    # the pivot is the median of the first, middle and last values ("median-of-three"), so sorted or reversed input
+    # (for example, a ranking that was just sorted) still splits evenly;
+    # each pass splits the values into three parts (< pivot, == pivot, > pivot), so the many tied chompability values are
+    # never partitioned again;
+    # sub-arrays are kept on an explicit stack instead of recursing (the smaller side is sorted first, so the stack holds at
+    # most log2(n) entries), so there is no recursion limit to raise;
+    # sub-arrays of INSERTION_CUTOFF values or fewer are finished with insertion sort, which is faster for a handful of values;
+    # if a sub-array is still being split after 2 * log2(n) passes, it is finished with heap sort instead.
+# "keys" is a list of chompability values, and "rows" a list of the same length; both are rearranged together, in place.
+INSERTION_CUTOFF = 16
+
+def introSort(keys, rows):
+    if len(keys) < 2:
+        return
+    stack = [(0, len(keys) - 1, 2 * (len(keys).bit_length()))]
+    while stack:
+        low, high, depthLimit = stack.pop()
+        while high - low >= INSERTION_CUTOFF:
+            # Too many passes: this sub-array is probably a bad case for Quick Sort.
+            if depthLimit == 0:
+                _heapSortRange(keys, rows, low, high)
+                break
+            depthLimit -= 1
+
+            # Median-of-three: ordering the first, middle and last values, and moving the middle one (the pivot) to the front.
+            middle = (low + high) // 2
+            if keys[middle] < keys[low]:
+                _swap(keys, rows, middle, low)
+            if keys[high] < keys[low]:
+                _swap(keys, rows, high, low)
+            if keys[high] < keys[middle]:
+                _swap(keys, rows, high, middle)
+            _swap(keys, rows, low, middle)
+            pivot = keys[low]
+
+            # Three-way partitioning (Bentley & McIlroy, reference: https://algs4.cs.princeton.edu/23quicksort/QuickBentleyMcIlroy.java.html).
+            # Two pointers scan inwards and swap values that are on the wrong side (like the original Hoare partition, so already sorted
+            # values are not moved), while values equal to the pivot are set aside at both ends and swapped into the middle at the end.
+            i, j = low, high + 1
+            equalLow, equalHigh = low, high + 1
+            while True:
+                i += 1
+                while keys[i] < pivot and i < high:
+                    i += 1
+                j -= 1
+                while pivot < keys[j] and j > low:
+                    j -= 1
+                if i == j and keys[i] == pivot:
+                    equalLow += 1
+                    _swap(keys, rows, equalLow, i)
+                if i >= j:
+                    break
+                _swap(keys, rows, i, j)
+                if keys[i] == pivot:
+                    equalLow += 1
+                    _swap(keys, rows, equalLow, i)
+                if keys[j] == pivot:
+                    equalHigh -= 1
+                    _swap(keys, rows, equalHigh, j)
+            i = j + 1
+            for k in range(low, equalLow + 1):
+                _swap(keys, rows, k, j)
+                j -= 1
+            for k in range(high, equalHigh - 1, -1):
+                _swap(keys, rows, k, i)
+                i += 1
+            # Now [low, j] < pivot, [j + 1, i - 1] == pivot and [i, high] > pivot.
+            lessEnd, greaterStart = j + 1, i - 1
+
+            # The values equal to the pivot are in place. The larger side is pushed onto the stack and the smaller side is sorted next.
+            if lessEnd - low < high - greaterStart:
+                stack.append((greaterStart + 1, high, depthLimit))
+                high = lessEnd - 1
+            else:
+                stack.append((low, lessEnd - 1, depthLimit))
+                low = greaterStart + 1
+        else:
+            _insertionSortRange(keys, rows, low, high)
+
+def _swap(keys, rows, a, b):
+    keys[a], keys[b] = keys[b], keys[a]
+    rows[a], rows[b] = rows[b], rows[a]
+
+# INSERTION SORT (of keys[low:high + 1]).
+# Reference: https://en.wikipedia.org/wiki/Insertion_sort
+def _insertionSortRange(keys, rows, low, high):
+    for i in range(low + 1, high + 1):
+        key = keys[i]
+        row = rows[i]
+        j = i - 1
+        while j >= low and keys[j] > key:
+            keys[j + 1] = keys[j]
+            rows[j + 1] = rows[j]
+            j -= 1
+        keys[j + 1] = key
+        rows[j + 1] = row
+
+# HEAP SORT (of keys[low:high + 1]), with an iterative sift-down, used when introsort runs out of passes.
+def _heapSortRange(keys, rows, low, high):
+    size = high - low + 1
+    for root in range(size // 2 - 1, -1, -1):
+        _siftDownRange(keys, rows, low, root, size)
+    for end in range(size - 1, 0, -1):
+        _swap(keys, rows, low, low + end)
+        _siftDownRange(keys, rows, low, 0, end)
+
+def _siftDownRange(keys, rows, offset, root, size):
+    while True:
+        largest = root
+        left = 2 * root + 1
+        right = left + 1
+        if left < size and keys[offset + left] > keys[offset + largest]:
+            largest = left
+        if right < size and keys[offset + right] > keys[offset + largest]:
+            largest = right
+        if largest == root:
+            return
+        _swap(keys, rows, offset + root, offset + largest)
+        root = largest
+
+# SORTING ROW NUMBERS
+# The algorithms above rearrange objects with a ".chompability" attribute. To sort a column of chompability values without touching
+# the store (for example, to rank a closeness factor other than the one on display), each value is wrapped in a LocationView
+# of this small holder, and the row numbers are read back out once the views are sorted.
+class _Keys:
+    __slots__ = ("chompability",)
+
+    def __init__(self, keys):
+        self.chompability = keys
+
+def _sortedRows(keys, sortFunction):
+    holder = _Keys(keys)
+    views = [LocationView(holder, row) for row in range(len(keys))]
+    sortFunction(views)
+    return array("I", [view.row for view in views])
+
+# Each of these returns the row numbers of "keys" (a column of chompability values), from the LOWEST to the HIGHEST value.
+def quickSortOrder(keys):
+    return _sortedRows(keys, lambda views: quickSort(views, 0, len(views) - 1))
+
+# The heap sort that ranks the locations, so it is the one counted as "heapSort" in the metrics.
+def heapSortOrder(keys):
+    keyList = list(keys)
+    rows = list(range(len(keyList)))
+    comparisons, moves = fastHeapSort(keyList, rows)
+    metrics.count("heapSort.comparisons", comparisons)
+    metrics.count("heapSort.moves", moves)
+    return array("I", rows)
+
+# The original, recursive "heapSort" (kept for comparison, see "benchmarks/heapsort.py").
+def recursiveHeapSortOrder(keys):
+    return _sortedRows(keys, heapSort)
+
+def introSortOrder(keys):
+    keyList = list(keys)
+    rows = list(range(len(keyList)))
+    introSort(keyList, rows)
+    return array("I", rows)
+
+# TOP-K SELECTION - called with "selectOrder(keys, k, largest=True)".
+# When only the top (or bottom) "k" locations are wanted, sorting all of them is wasted work. Instead, every value is pushed through
+# a heap that never holds more than k entries, which takes O(n log k) time instead of O(n log n).
+# "rows" limits the selection to some of the rows (by default, every row is considered).
+# Returns the selected row numbers from the LOWEST to the HIGHEST chompability, like the full orders below.
+def selectOrder(keys, k, largest=True, rows=None):
+    if rows is None:
+        rows = range(len(keys))
+    if largest:
+        selected = heapq.nlargest(k, rows, key=keys.__getitem__)
+        selected.reverse()
+    else:
+        selected = heapq.nsmallest(k, rows, key=keys.__getitem__)
+    return array("I", selected)
+
+# The name of the selection mode in the "Sort Type" option box (it is not in ALGORITHMS, since it does not produce a full order).
+TOP_K_SELECT = "Top-K Select"
+
+# The sorting algorithms offered in the "Sort Type" option box, by name.
+ALGORITHMS = {
+    "Quick Sort": quickSortOrder,
+    "Heap Sort": heapSortOrder,
+    "Intro Sort": introSortOrder,
+}
+
+# Called with "sortOrder(keys, "Heap Sort")".
+def sortOrder(keys, algorithm):
+    with metrics.timer("sort." + algorithm):
+        return ALGORITHMS[algorithm](keys)
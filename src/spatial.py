@@ -0,0 +1,181 @@
+# SPATIAL INDEX
+# Reference: https://en.wikipedia.org/wiki/K-d_tree
+# Finds the locations nearest to any point (or within some distance of it) without computing the distance to every location.
+# Every location's latitude/longitude is turned into a point on a sphere of radius 1 (x, y, z), where the straight-line ("chord")
+# distance between two points only grows with the distance along the Earth's surface; so a plain 3-D KD-tree can be searched
+# with cheap squared distances, and only the locations that are returned are converted back to kilometers.
+# The tree is kept "implicitly" in a few flat arrays: the locations are reordered so that every node is a contiguous range of them,
+# split at its median, and node "i" has children "2i + 1" and "2i + 2" (like the heap in "sorting.py").
+import heapq
+import math
+from array import array
+
+# The mean radius of the Earth in kilometers (half of the 12,742 km diameter used by "distance" in "locationstore.py").
+EARTH_RADIUS = 6371.0
+# Nodes with at most this many locations are not split any further; they are searched one location at a time.
+LEAF_SIZE = 16
+
+# Returns the point (x, y, z) on the unit sphere for a latitude/longitude pair in degrees.
+def toUnitVector(latitude, longitude):
+    latitude = math.radians(latitude)
+    longitude = math.radians(longitude)
+    cosLatitude = math.cos(latitude)
+    return (cosLatitude * math.cos(longitude), cosLatitude * math.sin(longitude), math.sin(latitude))
+
+# Converts between a distance along the Earth's surface (in kilometers) and the squared chord distance on the unit sphere.
+def _chordSquared(kilometers):
+    angle = min(kilometers / EARTH_RADIUS, math.pi)
+    return (2 * math.sin(angle / 2)) ** 2
+
+def _kilometers(chordSquared):
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(chordSquared) / 2))
+
+# CLASS: SpatialIndex
+# Called with "SpatialIndex(store.latitude, store.longitude)" (or "SpatialIndex.fromStore(store)").
+# Rows are the positions of the locations in the given columns, as everywhere else.
+class SpatialIndex:
+    def __init__(self, latitude, longitude):
+        numRows = len(latitude)
+        points = [toUnitVector(lat, lon) for lat, lon in zip(latitude, longitude)]
+        # The x, y and z coordinates as separate columns, so they can be read with "list.__getitem__" (without a Python lambda).
+        coordinates = [[point[axis] for point in points] for axis in range(3)]
+        order = list(range(numRows))
+
+        # Every node's split axis (0 = x, 1 = y, 2 = z; -1 for a leaf) and bounding box
+        # (the lowest and highest x, y and z of its locations, at "6 * node"), by node number.
+        numNodes = 1
+        while (numNodes + 1) // 2 * LEAF_SIZE < numRows:
+            numNodes = numNodes * 2 + 1
+        self.axes = array("b", [-1]) * numNodes
+        self.boxes = array("d", bytes(8 * 6 * numNodes))
+
+        # Nodes are split one at a time from a stack, instead of recursively. Each node is split along the axis on which its
+        # locations are the most spread out, at its median, so both children hold half of its locations.
+        stack = [(0, 0, numRows)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo == hi:
+                continue
+            rows = order[lo:hi]
+            for axis in range(3):
+                values = list(map(coordinates[axis].__getitem__, rows))
+                self.boxes[6 * node + axis] = min(values)
+                self.boxes[6 * node + 3 + axis] = max(values)
+            if hi - lo <= LEAF_SIZE or 2 * node + 1 >= numNodes:
+                continue
+            spreads = [self.boxes[6 * node + 3 + axis] - self.boxes[6 * node + axis] for axis in range(3)]
+            axis = spreads.index(max(spreads))
+            rows.sort(key=coordinates[axis].__getitem__)
+            order[lo:hi] = rows
+            mid = (lo + hi) // 2
+            self.axes[node] = axis
+            stack.append((2 * node + 1, lo, mid))
+            stack.append((2 * node + 2, mid, hi))
+
+        # The coordinates are stored in tree order, so a leaf's locations sit next to each other.
+        self.rows = array("I", order)
+        self.x = array("d", map(coordinates[0].__getitem__, order))
+        self.y = array("d", map(coordinates[1].__getitem__, order))
+        self.z = array("d", map(coordinates[2].__getitem__, order))
+        self.numNodes = numNodes
+
+    @classmethod
+    def fromStore(cls, store):
+        return cls(store.latitude, store.longitude)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Returns the k locations nearest to a latitude/longitude pair, as a list of (row, kilometers), from the nearest.
+    def nearest(self, latitude, longitude, k):
+        if k <= 0 or not self.rows:
+            return []
+        point = toUnitVector(latitude, longitude)
+        x, y, z = self.x, self.y, self.z
+        px, py, pz = point
+        # The k nearest locations found so far, as a heap of (-squared distance, index) (so the farthest one is on top).
+        found = []
+        bound = math.inf
+        stack = [(0.0, 0, 0, len(self.rows))]
+        while stack:
+            gap, node, lo, hi = stack.pop()
+            if gap > bound:
+                continue
+            if self._isLeaf(node):
+                for i in range(lo, hi):
+                    dx = x[i] - px
+                    dy = y[i] - py
+                    dz = z[i] - pz
+                    distanceSquared = dx * dx + dy * dy + dz * dz
+                    if len(found) < k:
+                        heapq.heappush(found, (-distanceSquared, i))
+                        if len(found) == k:
+                            bound = -found[0][0]
+                    elif distanceSquared < bound:
+                        heapq.heapreplace(found, (-distanceSquared, i))
+                        bound = -found[0][0]
+                continue
+            self._pushChildren(stack, point, node, lo, hi, bound)
+        found.sort(reverse=True)
+        return [(self.rows[i], _kilometers(-negative)) for negative, i in found]
+
+    # Returns every location within "radius" kilometers of a latitude/longitude pair, as a list of (row, kilometers), from the nearest.
+    def within(self, latitude, longitude, radius):
+        if not self.rows:
+            return []
+        point = toUnitVector(latitude, longitude)
+        x, y, z = self.x, self.y, self.z
+        px, py, pz = point
+        bound = _chordSquared(radius)
+        found = []
+        stack = [(0.0, 0, 0, len(self.rows))]
+        while stack:
+            gap, node, lo, hi = stack.pop()
+            if self._isLeaf(node):
+                for i in range(lo, hi):
+                    dx = x[i] - px
+                    dy = y[i] - py
+                    dz = z[i] - pz
+                    distanceSquared = dx * dx + dy * dy + dz * dz
+                    if distanceSquared <= bound:
+                        found.append((distanceSquared, i))
+                continue
+            self._pushChildren(stack, point, node, lo, hi, bound)
+        found.sort()
+        return [(self.rows[i], _kilometers(distanceSquared)) for distanceSquared, i in found]
+
+    # Returns the sorted rows of every location within "radius" kilometers (a posting list, like the ones in "indexes.py").
+    def rowsWithin(self, latitude, longitude, radius):
+        return array("I", sorted(row for row, kilometers in self.within(latitude, longitude, radius)))
+
+    def _isLeaf(self, node):
+        return node >= self.numNodes or self.axes[node] < 0
+
+    # Pushes the children of a node that might hold a location closer than "bound" (a squared distance), with the squared distance
+    # from the point to their bounding boxes. The nearer child is pushed last, so it is searched first (and tightens the bound
+    # of a nearest search before the farther one is checked).
+    def _pushChildren(self, stack, point, node, lo, hi, bound):
+        mid = (lo + hi) // 2
+        children = []
+        for child, childLo, childHi in ((2 * node + 1, lo, mid), (2 * node + 2, mid, hi)):
+            gap = self._boxDistance(point, child)
+            if gap <= bound:
+                children.append((gap, child, childLo, childHi))
+        children.sort(reverse=True)
+        stack.extend(children)
+
+    # Returns the squared distance from a point to a node's bounding box (0 if the point is inside it).
+    def _boxDistance(self, point, node):
+        boxes = self.boxes
+        base = 6 * node
+        total = 0.0
+        for axis in range(3):
+            value = point[axis]
+            low = boxes[base + axis]
+            if value < low:
+                total += (low - value) ** 2
+            else:
+                high = boxes[base + 3 + axis]
+                if value > high:
+                    total += (value - high) ** 2
+        return total